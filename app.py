@@ -107,8 +107,8 @@ MOBILE_HEALTH_DATA_PATH = APP_DIR / "data" / "processed_mobile_data.json"
 MOBILE_HEALTH_DATA = {}
 try:
     if MOBILE_HEALTH_DATA_PATH.exists():
-        with open(MOBILE_HEALTH_DATA_PATH, "r", encoding="utf-8") as f:
-            MOBILE_HEALTH_DATA = json.load(f)
+        from functions.mobile_data_retriever import load_processed_data
+        MOBILE_HEALTH_DATA = load_processed_data(MOBILE_HEALTH_DATA_PATH)
         date_range = MOBILE_HEALTH_DATA.get('date_range', {})
         print(f"Loaded mobile health data: {date_range.get('start', 'N/A')} to {date_range.get('end', 'N/A')}")
     else:
@@ -444,22 +444,8 @@ def api_get_session(session_id: str):
                 convo.append({"role": m.get("role"), "content": content})
     return jsonify(success=True, conversation=convo)
 
-@app.route("/api/message", methods=["POST"])
-def api_message():
-    if not _require_login():
-        return jsonify(success=False, message="Login required"), 401
-
-    user = _username()
-    data = request.get_json(force=True)
-    session_id = data.get("session_id")
-    text = (data.get("message") or "").strip()
-    if not text:
-        return jsonify(success=False, assistant_message="Please type a message."), 400
-
-    d = _load_session(user, session_id)
-    if not d:
-        return jsonify(success=False, assistant_message="Session not found."), 404
-
+def _reply_to(d, text):
+    """Append a user message to the session, get the model reply and append it."""
     # Store user's original message
     d["conversation"].append({"role": "user", "content": text})
     
@@ -476,23 +462,48 @@ def api_message():
                 messages[i] = {"role": "system", "content": original_system + patient_info}
                 break
 
+    resp = Chatbot.llm_reply(messages)
+    assistant_text = resp.content if hasattr(resp, "content") else str(resp)
+    d["conversation"].append({"role": "assistant", "content": assistant_text})
+    return assistant_text
+
+def _maybe_generate_summary(user, session_id, conversation, new_user_turns=1):
+    """
+    Kick off title/summary generation once the first exchange has been answered.
+    new_user_turns is how many user messages the current request added, so a
+    batch that includes the first exchange triggers it exactly like /api/message.
+    """
+    user_messages = [msg for msg in conversation if msg.get("role") == "user"]
+    assistant_messages = [msg for msg in conversation if msg.get("role") == "assistant"]
+    
+    print(f"Message count - Users: {len(user_messages)}, Assistants: {len(assistant_messages)}")
+    print(f"Total conversation length: {len(conversation)}")
+    
+    if len(user_messages) == new_user_turns and len(assistant_messages) >= 2:
+        print("Triggering summary generation...")
+        _generate_summary_async(user, session_id, conversation)
+
+@app.route("/api/message", methods=["POST"])
+def api_message():
+    if not _require_login():
+        return jsonify(success=False, message="Login required"), 401
+
+    user = _username()
+    data = request.get_json(force=True)
+    session_id = data.get("session_id")
+    text = (data.get("message") or "").strip()
+    if not text:
+        return jsonify(success=False, assistant_message="Please type a message."), 400
+
+    d = _load_session(user, session_id)
+    if not d:
+        return jsonify(success=False, assistant_message="Session not found."), 404
+
     try:
-        resp = Chatbot.llm_reply(messages)
-        assistant_text = resp.content if hasattr(resp, "content") else str(resp)
-        d["conversation"].append({"role": "assistant", "content": assistant_text})
+        assistant_text = _reply_to(d, text)
         d["updated_at"] = _now_iso()
         _save_session(user, d)
-        
-        user_messages = [msg for msg in d["conversation"] if msg.get("role") == "user"]
-        assistant_messages = [msg for msg in d["conversation"] if msg.get("role") == "assistant"]
-        
-        print(f"Message count - Users: {len(user_messages)}, Assistants: {len(assistant_messages)}")
-        print(f"Total conversation length: {len(d['conversation'])}")
-        
-        if len(user_messages) == 1 and len(assistant_messages) == 2:
-            print("Triggering summary generation...")
-            _generate_summary_async(user, session_id, d["conversation"])
-        
+        _maybe_generate_summary(user, session_id, d["conversation"])
         return jsonify(success=True, assistant_message=assistant_text)
     except Exception as e:
         err = f"Error from model: {e}"
@@ -501,6 +512,48 @@ def api_message():
         _save_session(user, d)
         return jsonify(success=False, assistant_message=err), 500
 
+# Each bulk message is a model round-trip inside one request, so batches are capped
+MAX_BULK_MESSAGES = 20
+
+@app.route("/api/messages", methods=["POST"])
+def api_messages():
+    """Answer several user messages in order with one request and one session save."""
+    if not _require_login():
+        return jsonify(success=False, message="Login required"), 401
+
+    user = _username()
+    data = request.get_json(force=True)
+    if not isinstance(data, dict):
+        data = {}
+    session_id = data.get("session_id")
+    messages = data.get("messages")
+    if not isinstance(messages, list) or not messages or not all(isinstance(m, str) and m.strip() for m in messages):
+        return jsonify(success=False, assistant_messages=[], message="messages must be a non-empty list of non-empty strings."), 400
+    if len(messages) > MAX_BULK_MESSAGES:
+        return jsonify(success=False, assistant_messages=[], message=f"At most {MAX_BULK_MESSAGES} messages per request."), 400
+    texts = [m.strip() for m in messages]
+
+    d = _load_session(user, session_id)
+    if not d:
+        return jsonify(success=False, assistant_messages=[], message="Session not found."), 404
+
+    # Messages are answered sequentially so each reply sees the ones before it
+    replies = []
+    try:
+        for text in texts:
+            replies.append(_reply_to(d, text))
+    except Exception as e:
+        err = f"Error from model: {e}"
+        d["conversation"].append({"role": "assistant-error", "content": err})
+        d["updated_at"] = _now_iso()
+        _save_session(user, d)
+        return jsonify(success=False, assistant_messages=replies, message=err), 500
+
+    d["updated_at"] = _now_iso()
+    _save_session(user, d)
+    _maybe_generate_summary(user, session_id, d["conversation"], new_user_turns=len(texts))
+    return jsonify(success=True, assistant_messages=replies)
+
 @app.route("/api/rename_session", methods=["POST"])
 def api_rename_session():
     if not _require_login():
@@ -773,7 +826,7 @@ init_pdf_forms(app, _require_login, _username, Chatbot, _get_user_ehr_data,
 # --------------------------------------------------------------------------------
 # Global transcriber instance (per user session)
 transcriber_instances = {}
-# Track the last polled index for each user to avoid duplicate text
+# Track the transcription count at each user's last poll to avoid duplicate text
 transcriber_last_index = {}
 
 @app.route("/api/speech/start", methods=["POST"])
@@ -828,7 +881,7 @@ def api_speech_stop():
         history = transcriber.get_transcription_history()
         
         # Combine all transcriptions
-        all_text = " ".join([entry["text"] for entry in history])
+        all_text = " ".join([text for _, text in history])
         
         # Stop and cleanup
         transcriber.stop()
@@ -856,18 +909,13 @@ def api_speech_poll():
         transcriber = transcriber_instances[user]
         transcriber.process_pending_audio()
         
-        # Get latest text from history
-        history = transcriber.get_transcription_history()
-        
-        # Get the last index we sent to the client
+        # Get the last transcription count we sent to the client
         last_index = transcriber_last_index.get(user, 0)
         
-        # Only return new text since the last poll
-        new_entries = history[last_index:]
-        new_text = " ".join([entry["text"] for entry in new_entries])
-        
-        # Update the last index for this user
-        transcriber_last_index[user] = len(history)
+        # Only return new text since the last poll (history is capped, so
+        # positions are tracked by running count rather than list index)
+        new_texts, transcriber_last_index[user] = transcriber.get_transcriptions_since(last_index)
+        new_text = " ".join(new_texts)
         
         return jsonify(success=True, is_recording=True, text=new_text)
     except Exception as e:
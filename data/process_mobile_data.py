@@ -3,17 +3,29 @@
 Process Mobile Health Data Script
 
 Processes raw HealthKit data and generates processed_mobile_data.json
-Usage: python process_mobile_data.py
+Usage: python -I data/process_mobile_data.py  (after `pip install -e .`)
 """
 
 import sys
 from pathlib import Path
 
-# Add project root to path
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
+project_root = Path(__file__).resolve().parent.parent
 
-from functions.mobile_data_processor import process_all_mobile_data, save_processed_data
+# Shared default for missing sections in the summary (read-only, never mutated)
+_EMPTY = {}
+
+# Summary line templates; a line is only emitted when its section has data
+SUMMARY_TMPL = {
+    'header': "\nSummary:",
+    'hr_days': "  Heart Rate: {days} days of data",
+    'hr_avg': "    Recent avg: {avg} bpm",
+    'bp_count': "  Blood Pressure: {count} readings",
+    'bp_avg': "    Recent avg: {systolic}/{diastolic} mmHg",
+    'hrv_days': "  HRV: {days} days of data",
+    'hrv_avg': "    Recent avg: {avg} ms",
+    'steps_days': "  Steps: {days} days of data",
+    'output': "\nOutput file: {path}",
+}
 
 
 def main():
@@ -41,6 +53,9 @@ def main():
     print(f"Shifting dates by {date_offset_days} days to update to recent dates (January 2026)")
     print()
     
+    # Imported here so the numpy/numba stack is only loaded when there is data to process
+    from functions.mobile_data_processor import process_all_mobile_data, save_processed_data
+    
     # Process the data
     try:
         processed_data = process_all_mobile_data(raw_data_dir, date_offset_days)
@@ -57,35 +72,37 @@ def main():
         print("SUCCESS: Processing complete!")
         print("=" * 60)
         
-        # Print summary
-        print("\nSummary:")
-        heart_data = processed_data.get('heart_data', {})
+        # Print summary (collected first and written in one go)
+        out = [SUMMARY_TMPL['header']]
+        heart_data = processed_data.get('heart_data', _EMPTY)
         
-        if 'heart_rate' in heart_data:
-            hr_stats = heart_data['heart_rate'].get('daily_stats', [])
-            print(f"  Heart Rate: {len(hr_stats)} days of data")
-            if heart_data['heart_rate'].get('trends', {}).get('recent_avg'):
-                print(f"    Recent avg: {heart_data['heart_rate']['trends']['recent_avg']} bpm")
+        if (heart_rate := heart_data.get('heart_rate')) is not None:
+            hr_stats = heart_rate.get('daily_stats', ())
+            out.append(SUMMARY_TMPL['hr_days'].format(days=len(hr_stats)))
+            if recent_avg := heart_rate.get('trends', _EMPTY).get('recent_avg'):
+                out.append(SUMMARY_TMPL['hr_avg'].format(avg=recent_avg))
         
-        if 'blood_pressure' in heart_data:
-            bp_readings = heart_data['blood_pressure'].get('readings', [])
-            print(f"  Blood Pressure: {len(bp_readings)} readings")
-            trends = heart_data['blood_pressure'].get('trends', {})
-            if trends.get('recent_avg_systolic'):
-                print(f"    Recent avg: {trends['recent_avg_systolic']}/{trends.get('recent_avg_diastolic', 'N/A')} mmHg")
+        if (blood_pressure := heart_data.get('blood_pressure')) is not None:
+            bp_readings = blood_pressure.get('readings', ())
+            out.append(SUMMARY_TMPL['bp_count'].format(count=len(bp_readings)))
+            trends = blood_pressure.get('trends', _EMPTY)
+            if systolic := trends.get('recent_avg_systolic'):
+                out.append(SUMMARY_TMPL['bp_avg'].format(
+                    systolic=systolic, diastolic=trends.get('recent_avg_diastolic', 'N/A')))
         
-        if 'hrv' in heart_data:
-            hrv_data = heart_data['hrv'].get('daily_averages', [])
-            print(f"  HRV: {len(hrv_data)} days of data")
-            if heart_data['hrv'].get('trends', {}).get('recent_avg'):
-                print(f"    Recent avg: {heart_data['hrv']['trends']['recent_avg']} ms")
+        if (hrv := heart_data.get('hrv')) is not None:
+            hrv_data = hrv.get('daily_averages', ())
+            out.append(SUMMARY_TMPL['hrv_days'].format(days=len(hrv_data)))
+            if recent_avg := hrv.get('trends', _EMPTY).get('recent_avg'):
+                out.append(SUMMARY_TMPL['hrv_avg'].format(avg=recent_avg))
         
-        activity_data = processed_data.get('activity_data', {})
-        if 'daily_steps' in activity_data:
-            steps = activity_data['daily_steps']
-            print(f"  Steps: {len(steps)} days of data")
+        activity_data = processed_data.get('activity_data', _EMPTY)
+        if (steps := activity_data.get('daily_steps')) is not None:
+            out.append(SUMMARY_TMPL['steps_days'].format(days=len(steps)))
         
-        print(f"\nOutput file: {output_file}")
+        out.append(SUMMARY_TMPL['output'].format(path=output_file))
+        sys.stdout.write("\n".join(out) + "\n")
+        sys.stdout.flush()
         
     except Exception as e:
         print(f"\nERROR: Processing failed: {e}")
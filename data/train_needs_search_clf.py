@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Train Web Search Classifier Script
+
+Trains the local YES/NO web search classifier used by functions/web_search.py
+and writes functions/needs_search_clf.joblib
+Usage: python train_needs_search_clf.py labeled_queries.jsonl  (after `pip install -e .`)
+
+Each line of the input file is a JSON object like:
+    {"query": "Drug recalls this month", "needs_search": true}
+
+Requires scikit-learn and joblib. The app needs both at runtime too, to
+load the saved pipeline.
+"""
+
+import json
+import sys
+
+from joblib import dump
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import cross_val_score
+from sklearn.pipeline import make_pipeline
+
+from functions.web_search import NEEDS_SEARCH_CLF_PATH
+
+
+def main():
+    """Main training function."""
+    if len(sys.argv) != 2:
+        print("Usage: python train_needs_search_clf.py labeled_queries.jsonl")
+        sys.exit(1)
+
+    queries = []
+    labels = []
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                queries.append(record['query'])
+                labels.append(1 if record['needs_search'] else 0)
+
+    print(f"Loaded {len(queries)} labeled queries ({sum(labels)} need search)")
+
+    clf = make_pipeline(
+        HashingVectorizer(n_features=2**16, ngram_range=(1, 2), alternate_sign=False),
+        LogisticRegression(max_iter=1000)
+    )
+
+    scores = cross_val_score(clf, queries, labels, cv=5)
+    print(f"Cross-validated accuracy: {scores.mean():.3f} (+/- {scores.std():.3f})")
+
+    clf.fit(queries, labels)
+    dump(clf, NEEDS_SEARCH_CLF_PATH)
+    print(f"Saved classifier to: {NEEDS_SEARCH_CLF_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Numeric Kernels
+
+JIT-compiled reductions used by the mobile data processor.
+Without numba, the per-day reductions fall back to vectorized NumPy
+(bincount / ufunc.at) and the remaining kernels run as plain Python.
+
+The serial kernels can also be compiled ahead of time into an extension
+module (python -m functions._kernels); when it is present, fresh processes
+use it instead of JIT-compiling or loading the JIT cache.
+"""
+
+import os
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:  # numba is optional; see the NumPy fallbacks at the end
+    HAVE_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+@njit(cache=True, fastmath=True)
+def group_reduce(date_codes, values):
+    """
+    Reduce values into per-day sum/min/max/count.
+    The stable pre-sort is skipped when date_codes are already non-decreasing.
+
+    Args:
+        date_codes: int64 array of day codes (e.g. date ordinals), one per value
+        values: float64 array of sample values
+
+    Returns:
+        Tuple of (codes, sums, mins, maxs, counts) arrays, ordered by code
+    """
+    n = date_codes.shape[0]
+
+    # Records usually arrive in chronological order; only sort when they don't
+    is_sorted = True
+    for i in range(1, n):
+        if date_codes[i] < date_codes[i - 1]:
+            is_sorted = False
+            break
+    if is_sorted:
+        order = np.arange(n)
+    else:
+        order = np.argsort(date_codes, kind='mergesort')
+
+    codes = np.empty(n, dtype=np.int64)
+    sums = np.empty(n, dtype=np.float64)
+    mins = np.empty(n, dtype=np.float64)
+    maxs = np.empty(n, dtype=np.float64)
+    counts = np.empty(n, dtype=np.int64)
+
+    g = -1
+    for i in range(n):
+        idx = order[i]
+        code = date_codes[idx]
+        v = values[idx]
+        if g < 0 or code != codes[g]:
+            g += 1
+            codes[g] = code
+            sums[g] = v
+            mins[g] = v
+            maxs[g] = v
+            counts[g] = 1
+        else:
+            sums[g] += v
+            if v < mins[g]:
+                mins[g] = v
+            if v > maxs[g]:
+                maxs[g] = v
+            counts[g] += 1
+
+    g += 1
+    return codes[:g], sums[:g], mins[:g], maxs[:g], counts[:g]
+
+
+@njit(cache=True, fastmath=True)
+def window_means(avgs):
+    """
+    Compute the 7-day and 14-day window means used for trend detection.
+
+    Args:
+        avgs: float64 array of daily averages in chronological order (at least one value)
+
+    Returns:
+        Tuple of (recent_avg, first_avg, second_avg). recent_avg is the mean of the
+        last 7 values (or fewer); first_avg/second_avg are the means of days [-14:-7]
+        and [-7:], and are NaN when fewer than 14 values are available.
+    """
+    n = avgs.shape[0]
+    recent_n = min(n, 7)
+    first_sum = 0.0
+    second_sum = 0.0
+
+    # One pass over the trailing 14-day window
+    for i in range(max(n - 14, 0), n):
+        if i >= n - 7:
+            second_sum += avgs[i]
+        else:
+            first_sum += avgs[i]
+
+    recent_avg = second_sum / recent_n
+    if n >= 14:
+        return recent_avg, first_sum / 7.0, second_sum / 7.0
+    return recent_avg, np.nan, np.nan
+
+
+@njit(parallel=True, cache=True)
+def bin_reduce(day_idx, values, n_bins, chunk_size):
+    """
+    Reduce values into dense per-day bins without sorting.
+    Fixed-size chunks of samples are binned in parallel, then merged in chunk
+    order, so results do not depend on the thread count.
+
+    Args:
+        day_idx: int64 array of bin indices in [0, n_bins), one per value
+        values: float64 array of sample values
+        n_bins: number of bins (days spanned)
+        chunk_size: samples per parallel chunk
+
+    Returns:
+        Tuple of (sums, mins, maxs, counts) arrays of length n_bins;
+        bins with count 0 hold no samples
+    """
+    n = day_idx.shape[0]
+    n_chunks = max((n + chunk_size - 1) // chunk_size, 1)
+    sums = np.zeros((n_chunks, n_bins), dtype=np.float64)
+    mins = np.zeros((n_chunks, n_bins), dtype=np.float64)
+    maxs = np.zeros((n_chunks, n_bins), dtype=np.float64)
+    counts = np.zeros((n_chunks, n_bins), dtype=np.int64)
+
+    for c in prange(n_chunks):
+        for i in range(c * chunk_size, min(n, (c + 1) * chunk_size)):
+            b = day_idx[i]
+            v = values[i]
+            if counts[c, b] == 0:
+                sums[c, b] = v
+                mins[c, b] = v
+                maxs[c, b] = v
+            else:
+                sums[c, b] += v
+                if v < mins[c, b]:
+                    mins[c, b] = v
+                if v > maxs[c, b]:
+                    maxs[c, b] = v
+            counts[c, b] += 1
+
+    # Merge chunk partials in order
+    for c in range(1, n_chunks):
+        for b in range(n_bins):
+            if counts[c, b] == 0:
+                continue
+            if counts[0, b] == 0:
+                sums[0, b] = sums[c, b]
+                mins[0, b] = mins[c, b]
+                maxs[0, b] = maxs[c, b]
+            else:
+                sums[0, b] += sums[c, b]
+                if mins[c, b] < mins[0, b]:
+                    mins[0, b] = mins[c, b]
+                if maxs[c, b] > maxs[0, b]:
+                    maxs[0, b] = maxs[c, b]
+            counts[0, b] += counts[c, b]
+
+    return sums[0], mins[0], maxs[0], counts[0]
+
+
+# Kernels exported by the ahead-of-time build, with their signatures. bin_reduce
+# stays JIT-only since pycc cannot compile parallel (prange) loops.
+_AOT_EXPORTS = (
+    ('group_reduce', 'Tuple((i8[:], f8[:], f8[:], f8[:], i8[:]))(i8[:], f8[:])', group_reduce),
+    ('window_means', 'UniTuple(f8, 3)(f8[:])', window_means),
+)
+
+
+if not HAVE_NUMBA:
+    # Interpreted, the loops above cost a bytecode dispatch per sample; these
+    # do the same reductions in C. bincount accumulates in input order, so
+    # sums match the sequential kernels exactly.
+
+    def bin_reduce(day_idx, values, n_bins, chunk_size):
+        """NumPy version of bin_reduce (chunk_size is unused)."""
+        counts = np.bincount(day_idx, minlength=n_bins)
+        sums = np.bincount(day_idx, weights=values, minlength=n_bins)
+        mins = np.full(n_bins, np.inf)
+        maxs = np.full(n_bins, -np.inf)
+        np.minimum.at(mins, day_idx, values)
+        np.maximum.at(maxs, day_idx, values)
+        return sums, mins, maxs, counts
+
+    def group_reduce(date_codes, values):
+        """NumPy version of group_reduce for sparse day codes."""
+        codes, day_idx = np.unique(date_codes, return_inverse=True)
+        sums, mins, maxs, counts = bin_reduce(day_idx, values, codes.shape[0], 0)
+        return codes, sums, mins, maxs, counts
+
+
+def build_aot(output_dir=None):
+    """
+    Compile the serial kernels into the _kernels_aot extension module.
+    Requires numba (with numba.pycc) and a C compiler; the resulting module
+    only needs NumPy at runtime.
+
+    Args:
+        output_dir: Directory for the compiled module (defaults to this package)
+    """
+    from numba.pycc import CC
+
+    cc = CC('_kernels_aot')
+    cc.output_dir = output_dir or os.path.dirname(os.path.abspath(__file__))
+    for name, signature, kernel in _AOT_EXPORTS:
+        cc.export(name, signature)(kernel.py_func)
+    cc.compile()
+
+
+try:
+    from ._kernels_aot import group_reduce, window_means
+except ImportError:  # not built; use the JIT (or NumPy) kernels above
+    pass
+
+
+if __name__ == "__main__":
+    build_aot()
@@ -5,7 +5,7 @@ import threading
 import tiktoken
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from .web_search import web_search, format_search_results, needs_web_search
+from .web_search import web_search_async, run_on_search_loop, format_search_results
 from .health_analyzer import analyze_health_query, analyze_health_query_with_raw_data
 load_dotenv()
 
@@ -85,11 +85,13 @@ class Agent:
     
     
     def _web_search_task(self, query: str):
-        """Task for web search analysis."""
+        """Task for web search analysis (classification and search run concurrently)."""
         try:
-            if needs_web_search(query):
-                update_status("searching_web")
-                search_results = web_search(query)
+            # Runs on web_search's long-lived loop so its async client (and connections) are reused
+            search_results = run_on_search_loop(
+                web_search_async(query, on_search=lambda: update_status("searching_web"))
+            )
+            if search_results is not None:
                 update_status("analyzing_web_data")
                 return {
                     'search_results': search_results,
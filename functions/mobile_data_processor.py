@@ -5,20 +5,38 @@ Processes raw HealthKit data from JSON-Lines files into structured, aggregated f
 Focus on heart metrics (heart rate, HRV, blood pressure) with support for other categories.
 """
 
+import heapq
 import json
+import multiprocessing
 import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-from collections import defaultdict
-import statistics
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
+import numpy as np
 
-def load_jsonl_file(filepath: Path) -> List[Dict]:
-    """Load a JSON-Lines file (one JSON object per line)."""
-    data = []
+try:
+    import orjson
+except ImportError:  # fall back to the (slower) stdlib encoder in save_processed_data
+    orjson = None
+
+from ._kernels import bin_reduce, group_reduce, window_means
+from .mobile_data_retriever import COLUMNAR_SECTIONS, invalidate_mobile_data_cache
+
+# Raw HealthKit record keys, interned once for the per-record lookups
+_DATE = sys.intern('Date')
+_START = sys.intern('StartDate')
+_VALUE = sys.intern('Value')
+_UNITS = sys.intern('Units')
+
+
+def iter_jsonl_file(filepath: Path) -> Iterator[Dict]:
+    """Stream records from a JSON-Lines file (one JSON object per line)."""
     if not filepath.exists() or filepath.stat().st_size == 0:
-        return data
+        return
     
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -26,66 +44,186 @@ def load_jsonl_file(filepath: Path) -> List[Dict]:
                 line = line.strip()
                 if line:
                     try:
-                        data.append(json.loads(line))
+                        record = json.loads(line)
                     except json.JSONDecodeError:
                         continue
+                    yield record
     except Exception as e:
         print(f"Error loading {filepath.name}: {e}")
+
+
+def load_jsonl_file(filepath: Path) -> List[Dict]:
+    """Load a JSON-Lines file (one JSON object per line)."""
+    return list(iter_jsonl_file(filepath))
+
+
+class RawRecords:
+    """
+    Records of one raw data category, streamed from disk on each iteration.
     
-    return data
+    Only the file paths are held, so peak memory stays at one record per reader
+    and passing the category to a worker process pickles a few paths rather
+    than every parsed record.
+    """
+    
+    def __init__(self, files: List[Path]):
+        self.files = files
+    
+    def __iter__(self) -> Iterator[Dict]:
+        for file in self.files:
+            yield from iter_jsonl_file(file)
+    
+    def __bool__(self) -> bool:
+        # True if any file holds at least one record (reads only up to the first)
+        for _ in self:
+            return True
+        return False
 
 
-def parse_iso_date(date_str: str, date_offset_days: int = 0) -> Optional[datetime]:
+def parse_iso_date(date_str: str) -> Optional[datetime]:
     """
-    Parse ISO date string to datetime object with optional offset.
+    Parse ISO date string to a naive datetime object.
+    
+    Date offsets are applied afterwards in bulk (see reduce_by_day and
+    format_shifted_dates) rather than per record.
     
     Args:
         date_str: ISO format date string
-        date_offset_days: Number of days to add to the parsed date (for shifting data forward)
     """
     if not date_str:
         return None
     
     try:
-        # Handle formats like "2025-08-24T23:45:07-04:00"
-        if 'T' in date_str:
-            # Remove timezone suffix for parsing
-            if date_str.endswith('Z'):
-                date_str = date_str[:-1]
-            elif '+' in date_str[-6:] or '-' in date_str[-6:]:
-                date_str = date_str[:-6]
-            
-            dt = datetime.fromisoformat(date_str)
-        else:
-            dt = datetime.fromisoformat(date_str)
-        
-        # Apply date offset if specified
-        if date_offset_days != 0:
-            dt = dt + timedelta(days=date_offset_days)
-        
-        return dt
+        # Keep the local wall-clock time; an offset the suffix pattern missed is dropped too
+        return datetime.fromisoformat(_strip_timezone(date_str)).replace(tzinfo=None)
     except Exception as e:
         print(f"Error parsing date {date_str}: {e}")
         return None
 
 
+# A trailing "Z" or UTC offset after the time, with or without a "T" separator or a
+# space before it, e.g. "2025-08-24T23:45:07-04:00" or "2025-08-24 23:45:07 -0400"
+_TZ_SUFFIX_RE = re.compile(r'(\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)\s*(?:Z|[+-]\d{2}(?::?\d{2})?)$')
+
+
+def _strip_timezone(date_str: str) -> str:
+    """Drop a "Z" or UTC offset suffix, keeping the local time it qualifies."""
+    return _TZ_SUFFIX_RE.sub(r'\1', date_str)
+
+
+def _has_offset(time_part: str) -> bool:
+    """True if the time part of a date string still carries a "Z" or +/- offset."""
+    return 'Z' in time_part or '+' in time_part or '-' in time_part
+
+
+# datetime64 day 0 (1970-01-01) as a proleptic Gregorian ordinal
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def parse_iso_dates(date_strs: List[str]) -> np.ndarray:
+    """
+    Parse ISO date strings into a datetime64[us] array with one NumPy call,
+    instead of a datetime object per record.
+    
+    Timezone suffixes are dropped as in parse_iso_date (NumPy would convert them
+    to UTC and move the day). Unparsable strings are NaT; if any string needs it,
+    the batch is parsed per string with parse_iso_date.
+    """
+    try:
+        stripped = [_strip_timezone(date_str) for date_str in date_strs]
+        # Shorter strings are partial dates or NumPy specials ("NaT", "today") that
+        # datetime.fromisoformat rejects; any offset left in the time part is also
+        # kept away from NumPy
+        if all(len(date_str) >= 10 and not _has_offset(date_str[10:]) for date_str in stripped):
+            stamps = np.array(stripped, dtype='datetime64[us]')
+            if not np.isnat(stamps).any():
+                return stamps
+    except (TypeError, ValueError):
+        pass
+    
+    return np.array(
+        [parse_iso_date(date_str) or 'NaT' for date_str in date_strs],
+        dtype='datetime64[us]'
+    )
+
+
+def day_ordinals(stamps: np.ndarray) -> np.ndarray:
+    """Convert datetime64 timestamps to day ordinals (as datetime.toordinal())."""
+    return stamps.astype('datetime64[D]').astype(np.int64) + _EPOCH_ORDINAL
+
+
 def get_date_key(dt: datetime) -> str:
     """Convert datetime to date key (YYYY-MM-DD)."""
     return dt.strftime("%Y-%m-%d")
 
 
-def load_raw_mobile_data(directory_path: Path) -> Dict[str, List[Dict]]:
+def format_shifted_dates(timestamps: List[datetime], date_offset_days: int = 0) -> List[str]:
+    """Shift naive datetimes by whole days in one vector op and format them as ISO strings."""
+    stamps = np.array(timestamps, dtype='datetime64[us]') + np.timedelta64(date_offset_days, 'D')
+    # Match datetime.isoformat() per element: whole seconds unless that stamp has a sub-second part
+    whole = stamps.astype('datetime64[s]') == stamps
+    if whole.all():
+        return np.datetime_as_string(stamps, unit='s').tolist()
+    formatted = np.datetime_as_string(stamps, unit='us')
+    if whole.any():
+        formatted[whole] = np.datetime_as_string(stamps[whole], unit='s')
+    return formatted.tolist()
+
+
+# Dense day binning (bin_reduce) is used while chunks x days stays below this many
+# cells; sparse or very wide date spans fall back to the sort-based group_reduce
+_BIN_CHUNK_SIZE = 1 << 16
+_MAX_BIN_CELLS = 1 << 20
+
+
+def reduce_by_day(date_codes: List[int], values: List[float],
+                  date_offset_days: int = 0) -> List[Tuple[str, float, float, float, int]]:
     """
-    Load all raw mobile data files and organize by category.
+    Group values by day and reduce each day to sum/min/max/count.
+    
+    Args:
+        date_codes: Day ordinal (datetime.toordinal()) of each value, before offset
+        values: Sample values, parallel to date_codes
+        date_offset_days: Number of days added to every day code (one vector add)
+    
+    Returns:
+        List of (date_key, sum, min, max, count) tuples in chronological order
+    """
+    day_codes = np.asarray(date_codes, dtype=np.int64) + date_offset_days
+    values = np.asarray(values, dtype=np.float64)
+    
+    n_chunks = max(-(-day_codes.size // _BIN_CHUNK_SIZE), 1)
+    first_day = int(day_codes.min()) if day_codes.size else 0
+    n_days = int(day_codes.max()) - first_day + 1 if day_codes.size else 0
+    if 0 < n_days and n_days * n_chunks <= _MAX_BIN_CELLS:
+        sums, mins, maxs, counts = bin_reduce(day_codes - first_day, values, n_days, _BIN_CHUNK_SIZE)
+        present = np.flatnonzero(counts)
+        codes = present + first_day
+        sums, mins, maxs, counts = sums[present], mins[present], maxs[present], counts[present]
+    else:
+        codes, sums, mins, maxs, counts = group_reduce(day_codes, values)
+    
+    return [
+        (date.fromordinal(code).isoformat(), total, low, high, count)
+        for code, total, low, high, count in zip(
+            codes.tolist(), sums.tolist(), mins.tolist(), maxs.tolist(), counts.tolist()
+        )
+    ]
+
+
+def find_raw_mobile_files(directory_path: Path) -> Dict[str, List[Path]]:
+    """
+    Find the raw mobile data files of each category.
     
     Returns:
         Dict with keys like 'heart_rate', 'blood_pressure_systolic', etc.
+        mapping to the category's (non-deleted) files
     """
     if not directory_path.exists():
         print(f"Directory not found: {directory_path}")
         return {}
     
-    raw_data = {}
+    category_files = {}
     
     # Define file patterns and their categories
     file_categories = {
@@ -102,19 +240,53 @@ def load_raw_mobile_data(directory_path: Path) -> Dict[str, List[Dict]]:
         'hourly_hr_min': 'HealthKitV2Statistics_HourlyMinimumHeartRate_',
     }
     
-    # Load files for each category
-    for category, file_pattern in file_categories.items():
-        files = list(directory_path.glob(f"{file_pattern}*.json"))
-        category_data = []
-        
-        for file in files:
+    # One directory pass for all categories instead of a glob per category
+    files_by_category = {category: [] for category in file_categories}
+    with os.scandir(directory_path) as entries:
+        for entry in entries:
+            name = entry.name
             # Skip deleted files
-            if '_Deleted_' in file.name:
+            if not name.endswith('.json') or '_Deleted_' in name or not entry.is_file():
                 continue
-            
-            file_data = load_jsonl_file(file)
-            category_data.extend(file_data)
-        
+            for category, file_pattern in file_categories.items():
+                if name.startswith(file_pattern):
+                    files_by_category[category].append(directory_path / name)
+                    break
+    
+    for category, files in files_by_category.items():
+        if files:
+            category_files[category] = files
+    
+    return category_files
+
+
+def stream_raw_mobile_data(directory_path: Path) -> Dict[str, RawRecords]:
+    """
+    Organize raw mobile data by category without loading it.
+    
+    Returns:
+        Dict of categories holding at least one record, each streamed from disk
+    """
+    raw_data = {}
+    for category, files in find_raw_mobile_files(directory_path).items():
+        records = RawRecords(files)
+        if records:
+            raw_data[category] = records
+            print(f"Found {len(files)} file(s) for {category}")
+    
+    return raw_data
+
+
+def load_raw_mobile_data(directory_path: Path) -> Dict[str, List[Dict]]:
+    """
+    Load all raw mobile data files and organize by category.
+    
+    Returns:
+        Dict with keys like 'heart_rate', 'blood_pressure_systolic', etc.
+    """
+    raw_data = {}
+    for category, files in find_raw_mobile_files(directory_path).items():
+        category_data = list(RawRecords(files))
         if category_data:
             raw_data[category] = category_data
             print(f"Loaded {len(category_data)} records for {category}")
@@ -122,64 +294,146 @@ def load_raw_mobile_data(directory_path: Path) -> Dict[str, List[Dict]]:
     return raw_data
 
 
-def process_heart_rate_data(raw_data: List[Dict], date_offset_days: int = 0) -> Dict:
+def _numeric_value(record: Dict, value_key: str = _VALUE) -> Optional[float]:
+    """Return the record's value as a float, or None if it is not numeric."""
+    # Reject non-numeric values up front instead of raising inside float()
+    value = record.get(value_key, 0)
+    if type(value) is not float:
+        if not isinstance(value, (int, str)):
+            return None
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    return value
+
+
+def _collect_daily_values(records: Iterable[Dict], value_key: str = _VALUE,
+                          allow_zero: bool = False) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Process heart rate samples into daily statistics and trends.
-    
-    Args:
-        raw_data: List of heart rate records
-        date_offset_days: Number of days to offset dates (for updating to recent dates)
+    Collect (day, value) pairs for the per-day reduction.
     
     Returns:
-        Dict with daily_stats, recent_samples, and trends
+        Tuple of (date_codes, values) arrays; date codes are unshifted ordinals
     """
-    if not raw_data:
-        return {'daily_stats': [], 'recent_samples': [], 'trends': {}}
+    date_strs = []
+    values = []
     
-    # Group by date
-    daily_values = defaultdict(list)
-    all_samples = []
+    for record in records:
+        date_str = record.get(_DATE) or record.get(_START)
+        if not date_str:
+            continue
+        
+        value = _numeric_value(record, value_key)
+        if value is None:
+            continue
+        
+        # Filter out invalid values (zero is allowed for some metrics)
+        if value > 0 or (allow_zero and value == 0):
+            date_strs.append(date_str)
+            values.append(value)
+    
+    # Parse all timestamps at once and drop the unparsable ones
+    stamps = parse_iso_dates(date_strs)
+    valid = ~np.isnat(stamps)
+    return day_ordinals(stamps[valid]), np.array(values, dtype=np.float64)[valid]
+
+
+def _collect_heart_rate(records: Iterable[Dict]) -> Tuple[np.ndarray, np.ndarray, List[Tuple[datetime, float, str]]]:
+    """
+    Collect heart rate (day, value) pairs plus the 50 most recent samples.
+    
+    Returns:
+        Tuple of (date_codes, values, recent), where recent holds (datetime, value, units)
+        tuples in input order, so partial results can be merged and re-ranked stably
+    """
+    date_strs = []
+    values = []
+    sample_units = []
     
-    for record in raw_data:
-        date_str = record.get('Date') or record.get('StartDate')
+    for record in records:
+        date_str = record.get(_DATE) or record.get(_START)
         if not date_str:
             continue
         
-        dt = parse_iso_date(date_str, date_offset_days)
-        if not dt:
+        value = _numeric_value(record)
+        if value is None:
             continue
         
-        date_key = get_date_key(dt)
+        if value > 0:  # Filter out invalid values
+            date_strs.append(date_str)
+            values.append(value)
+            sample_units.append(record.get(_UNITS, 'count/min'))
+    
+    # Parse all timestamps at once and drop the unparsable ones
+    stamps = parse_iso_dates(date_strs)
+    valid = ~np.isnat(stamps)
+    if not valid.all():
+        stamps = stamps[valid]
+        values = [v for v, ok in zip(values, valid.tolist()) if ok]
+        sample_units = [u for u, ok in zip(sample_units, valid.tolist()) if ok]
+    
+    # Only the most recent samples are reported, so drop the rest early
+    sample_times = stamps.astype(np.int64).tolist()
+    recent = sorted(heapq.nlargest(50, range(len(sample_times)), key=sample_times.__getitem__))
+    return (
+        day_ordinals(stamps),
+        np.array(values, dtype=np.float64),
+        [(stamps[i].item(), values[i], sample_units[i]) for i in recent]
+    )
+
+
+def _collect_bp_values(records: Iterable[Dict]) -> Dict[datetime, float]:
+    """Collect blood pressure values keyed by timestamp (later records win)."""
+    date_strs = []
+    values = []
+    
+    for record in records:
+        date_str = record.get(_DATE) or record.get(_START)
+        if not date_str:
+            continue
         
-        try:
-            value = float(record.get('Value', 0))
-            if value > 0:  # Filter out invalid values
-                daily_values[date_key].append(value)
-                all_samples.append({
-                    'date': dt.isoformat(),  # Use shifted date
-                    'value': value,
-                    'units': record.get('Units', 'count/min')
-                })
-        except (ValueError, TypeError):
+        value = _numeric_value(record)
+        if value is None:
             continue
+        
+        if value > 0:
+            date_strs.append(date_str)
+            values.append(value)
     
+    # Parse all timestamps at once (datetime64[us].tolist() yields datetimes)
+    readings = {}
+    for dt, value in zip(parse_iso_dates(date_strs).tolist(), values):
+        if dt is not None:  # NaT: unparsable date
+            readings[dt] = value
+    
+    return readings
+
+
+def _summarize_heart_rate(date_codes, values, recent: List[Tuple[datetime, float, str]],
+                          date_offset_days: int = 0) -> Dict:
+    """Build heart rate daily stats, recent samples and trends from collected samples."""
     # Calculate daily statistics
     daily_stats = []
-    for date_key in sorted(daily_values.keys()):
-        values = daily_values[date_key]
+    for date_key, total, low, high, count in reduce_by_day(date_codes, values, date_offset_days):
         daily_stats.append({
             'date': date_key,
-            'avg': round(statistics.mean(values), 1),
-            'min': round(min(values), 1),
-            'max': round(max(values), 1),
-            'count': len(values)
+            'avg': round(total / count, 1),
+            'min': round(low, 1),
+            'max': round(high, 1),
+            'count': count
         })
     
     # Calculate trends
     trends = calculate_heart_rate_trends(daily_stats)
     
-    # Keep only recent samples (last 50)
-    recent_samples = sorted(all_samples, key=lambda x: x['date'], reverse=True)[:50]
+    # Keep only recent samples (last 50); only those need shifted, formatted dates
+    top = heapq.nlargest(50, range(len(recent)), key=lambda i: recent[i][0])
+    recent_dates = format_shifted_dates([recent[i][0] for i in top], date_offset_days)
+    recent_samples = [
+        {'date': date_str, 'value': recent[i][1], 'units': recent[i][2]}
+        for date_str, i in zip(recent_dates, top)
+    ]
     
     return {
         'daily_stats': daily_stats,
@@ -188,122 +442,43 @@ def process_heart_rate_data(raw_data: List[Dict], date_offset_days: int = 0) ->
     }
 
 
-def process_blood_pressure_data(systolic_data: List[Dict], diastolic_data: List[Dict], date_offset_days: int = 0) -> Dict:
-    """
-    Process blood pressure data (systolic and diastolic).
-    
-    Args:
-        systolic_data: List of systolic BP records
-        diastolic_data: List of diastolic BP records
-        date_offset_days: Number of days to offset dates
-    
-    Returns:
-        Dict with readings and trends
-    """
-    if not systolic_data and not diastolic_data:
-        return {'readings': [], 'trends': {}}
-    
+def _summarize_blood_pressure(systolic: Iterable[Dict[datetime, float]], diastolic: Iterable[Dict[datetime, float]],
+                              date_offset_days: int = 0) -> Dict:
+    """Pair collected systolic/diastolic values by timestamp and build readings and trends."""
     # Combine systolic and diastolic by matching timestamps
     readings_dict = {}
+    for part in systolic:
+        for dt, value in part.items():
+            readings_dict.setdefault(dt, {})['systolic'] = value
+    for part in diastolic:
+        for dt, value in part.items():
+            readings_dict.setdefault(dt, {})['diastolic'] = value
     
-    # Process systolic
-    for record in systolic_data:
-        date_str = record.get('Date') or record.get('StartDate')
-        if not date_str:
-            continue
-        
-        dt = parse_iso_date(date_str, date_offset_days)
-        if not dt:
-            continue
-        
-        shifted_date = dt.isoformat()
-        
-        try:
-            value = float(record.get('Value', 0))
-            if value > 0:
-                readings_dict[shifted_date] = readings_dict.get(shifted_date, {})
-                readings_dict[shifted_date]['systolic'] = value
-                readings_dict[shifted_date]['date'] = shifted_date
-        except (ValueError, TypeError):
-            continue
-    
-    # Process diastolic
-    for record in diastolic_data:
-        date_str = record.get('Date') or record.get('StartDate')
-        if not date_str:
-            continue
-        
-        dt = parse_iso_date(date_str, date_offset_days)
-        if not dt:
-            continue
-        
-        shifted_date = dt.isoformat()
-        
-        try:
-            value = float(record.get('Value', 0))
-            if value > 0:
-                readings_dict[shifted_date] = readings_dict.get(shifted_date, {})
-                readings_dict[shifted_date]['diastolic'] = value
-                readings_dict[shifted_date]['date'] = shifted_date
-        except (ValueError, TypeError):
-            continue
+    # Shift and format all reading timestamps at once
+    for date_str, reading in zip(format_shifted_dates(list(readings_dict), date_offset_days), readings_dict.values()):
+        reading['date'] = date_str
     
-    # Convert to list and sort
-    readings = [r for r in readings_dict.values() if 'systolic' in r or 'diastolic' in r]
-    readings.sort(key=lambda x: x['date'], reverse=True)
+    # Keep last 100 readings, newest first, without sorting the full history
+    readings = heapq.nlargest(100, readings_dict.values(), key=lambda x: x['date'])
     
     # Calculate trends
     trends = calculate_bp_trends(readings)
     
     return {
-        'readings': readings[:100],  # Keep last 100 readings
+        'readings': readings,
         'trends': trends
     }
 
 
-def process_hrv_data(raw_data: List[Dict], date_offset_days: int = 0) -> Dict:
-    """
-    Process heart rate variability data.
-    
-    Args:
-        raw_data: List of HRV records
-        date_offset_days: Number of days to offset dates
-    
-    Returns:
-        Dict with daily averages and trends
-    """
-    if not raw_data:
-        return {'daily_averages': [], 'trends': {}}
-    
-    # Group by date
-    daily_values = defaultdict(list)
-    
-    for record in raw_data:
-        date_str = record.get('Date') or record.get('StartDate')
-        if not date_str:
-            continue
-        
-        dt = parse_iso_date(date_str, date_offset_days)
-        if not dt:
-            continue
-        
-        date_key = get_date_key(dt)
-        
-        try:
-            value = float(record.get('Value', 0))
-            if value > 0:  # Filter out invalid values
-                daily_values[date_key].append(value)
-        except (ValueError, TypeError):
-            continue
-    
+def _summarize_hrv(date_codes, values, date_offset_days: int = 0) -> Dict:
+    """Build HRV daily averages and trends from collected samples."""
     # Calculate daily averages
     daily_averages = []
-    for date_key in sorted(daily_values.keys()):
-        values = daily_values[date_key]
+    for date_key, total, _, _, count in reduce_by_day(date_codes, values, date_offset_days):
         daily_averages.append({
             'date': date_key,
-            'avg': round(statistics.mean(values), 1),
-            'count': len(values)
+            'avg': round(total / count, 1),
+            'count': count
         })
     
     # Calculate trends
@@ -315,12 +490,84 @@ def process_hrv_data(raw_data: List[Dict], date_offset_days: int = 0) -> Dict:
     }
 
 
-def calculate_daily_aggregates(samples: List[Dict], value_key: str = 'Value', date_offset_days: int = 0) -> List[Dict]:
+def _summarize_daily_aggregates(date_codes, values, date_offset_days: int = 0) -> List[Dict]:
+    """Build daily sum/avg/min/max aggregates from collected samples."""
+    daily_stats = []
+    for date_key, total, low, high, count in reduce_by_day(date_codes, values, date_offset_days):
+        daily_stats.append({
+            'date': date_key,
+            'sum': round(total, 1),
+            'avg': round(total / count, 1),
+            'min': round(low, 1),
+            'max': round(high, 1),
+            'count': count
+        })
+    
+    return daily_stats
+
+
+def process_heart_rate_data(raw_data: Iterable[Dict], date_offset_days: int = 0) -> Dict:
+    """
+    Process heart rate samples into daily statistics and trends.
+    
+    Args:
+        raw_data: Heart rate records (a list or streamed RawRecords)
+        date_offset_days: Number of days to offset dates (for updating to recent dates)
+    
+    Returns:
+        Dict with daily_stats, recent_samples, and trends
+    """
+    if not raw_data:
+        return {'daily_stats': [], 'recent_samples': [], 'trends': {}}
+    
+    return _summarize_heart_rate(*_collect_heart_rate(raw_data), date_offset_days)
+
+
+def process_blood_pressure_data(systolic_data: Iterable[Dict], diastolic_data: Iterable[Dict], date_offset_days: int = 0) -> Dict:
+    """
+    Process blood pressure data (systolic and diastolic).
+    
+    Args:
+        systolic_data: Systolic BP records (a list or streamed RawRecords)
+        diastolic_data: Diastolic BP records (a list or streamed RawRecords)
+        date_offset_days: Number of days to offset dates
+    
+    Returns:
+        Dict with readings and trends
+    """
+    if not systolic_data and not diastolic_data:
+        return {'readings': [], 'trends': {}}
+    
+    return _summarize_blood_pressure(
+        [_collect_bp_values(systolic_data)],
+        [_collect_bp_values(diastolic_data)],
+        date_offset_days
+    )
+
+
+def process_hrv_data(raw_data: Iterable[Dict], date_offset_days: int = 0) -> Dict:
+    """
+    Process heart rate variability data.
+    
+    Args:
+        raw_data: HRV records (a list or streamed RawRecords)
+        date_offset_days: Number of days to offset dates
+    
+    Returns:
+        Dict with daily averages and trends
+    """
+    if not raw_data:
+        return {'daily_averages': [], 'trends': {}}
+    
+    return _summarize_hrv(*_collect_daily_values(raw_data), date_offset_days)
+
+
+def calculate_daily_aggregates(samples: Iterable[Dict], value_key: str = 'Value', date_offset_days: int = 0) -> List[Dict]:
     """
     Generic function to calculate daily aggregates from samples.
     
     Args:
-        samples: List of sample records
+        samples: Sample records (a list or streamed RawRecords)
         value_key: Key to extract value from (default 'Value')
         date_offset_days: Number of days to offset dates
     
@@ -330,40 +577,45 @@ def calculate_daily_aggregates(samples: List[Dict], value_key: str = 'Value', da
     if not samples:
         return []
     
-    daily_values = defaultdict(list)
-    
-    for record in samples:
-        date_str = record.get('Date') or record.get('StartDate')
-        if not date_str:
-            continue
-        
-        dt = parse_iso_date(date_str, date_offset_days)
-        if not dt:
-            continue
-        
-        date_key = get_date_key(dt)
-        
-        try:
-            value = float(record.get(value_key, 0))
-            if value >= 0:  # Allow zero for some metrics
-                daily_values[date_key].append(value)
-        except (ValueError, TypeError):
-            continue
-    
-    # Calculate daily statistics
-    daily_stats = []
-    for date_key in sorted(daily_values.keys()):
-        values = daily_values[date_key]
-        daily_stats.append({
-            'date': date_key,
-            'sum': round(sum(values), 1),
-            'avg': round(statistics.mean(values), 1),
-            'min': round(min(values), 1),
-            'max': round(max(values), 1),
-            'count': len(values)
-        })
+    return _summarize_daily_aggregates(
+        *_collect_daily_values(samples, value_key, allow_zero=True),
+        date_offset_days
+    )
+
+
+# Raw categories that are aggregated (the others are only listed in metadata)
+_AGGREGATED_CATEGORIES = (
+    'heart_rate', 'blood_pressure_systolic', 'blood_pressure_diastolic', 'hrv', 'daily_steps'
+)
+
+
+def _process_one_file(category: str, path: Path):
+    """
+    Parse one raw data file into a partial result that the parent merges.
+    Module-level so it can be pickled to worker processes.
     
-    return daily_stats
+    Args:
+        category: Raw data category of the file (e.g. 'heart_rate')
+        path: JSON-Lines file to parse
+    """
+    records = iter_jsonl_file(path)
+    if category == 'heart_rate':
+        return _collect_heart_rate(records)
+    if category in ('blood_pressure_systolic', 'blood_pressure_diastolic'):
+        return _collect_bp_values(records)
+    if category == 'hrv':
+        return _collect_daily_values(records)
+    if category == 'daily_steps':
+        return _collect_daily_values(records, _VALUE, allow_zero=True)
+    raise ValueError(f"No per-file processing for category {category!r}")
+
+
+def _concat_partials(partials: List[Tuple]) -> Tuple[np.ndarray, np.ndarray]:
+    """Concatenate per-file (date_codes, values) arrays in file order."""
+    return (
+        np.concatenate([p[0] for p in partials]) if partials else np.empty(0, dtype=np.int64),
+        np.concatenate([p[1] for p in partials]) if partials else np.empty(0, dtype=np.float64)
+    )
 
 
 def calculate_heart_rate_trends(daily_stats: List[Dict]) -> Dict:
@@ -371,17 +623,13 @@ def calculate_heart_rate_trends(daily_stats: List[Dict]) -> Dict:
     if len(daily_stats) < 2:
         return {'recent_avg': None, 'trend': 'insufficient_data'}
     
-    # Get recent average (last 7 days)
-    recent_days = daily_stats[-7:]
-    recent_avg = statistics.mean([d['avg'] for d in recent_days])
+    # Recent average (last 7 days) and first/second half of the last 14 days
+    recent_avg, first_avg, second_avg = window_means(
+        np.array([d['avg'] for d in daily_stats[-14:]], dtype=np.float64)
+    )
     
     # Calculate trend (comparing first half vs second half of recent period)
     if len(daily_stats) >= 14:
-        first_half = daily_stats[-14:-7]
-        second_half = daily_stats[-7:]
-        first_avg = statistics.mean([d['avg'] for d in first_half])
-        second_avg = statistics.mean([d['avg'] for d in second_half])
-        
         diff = second_avg - first_avg
         if abs(diff) < 2:
             trend = 'stable'
@@ -393,7 +641,7 @@ def calculate_heart_rate_trends(daily_stats: List[Dict]) -> Dict:
         trend = 'stable'
     
     return {
-        'recent_avg': round(recent_avg, 1),
+        'recent_avg': round(float(recent_avg), 1),
         'trend': trend,
         'min_recorded': min([d['min'] for d in daily_stats]),
         'max_recorded': max([d['max'] for d in daily_stats])
@@ -405,19 +653,38 @@ def calculate_bp_trends(readings: List[Dict]) -> Dict:
     if len(readings) < 2:
         return {'recent_avg_systolic': None, 'recent_avg_diastolic': None, 'trend': 'insufficient_data'}
     
-    # Get recent averages
-    systolic_values = [r['systolic'] for r in readings if 'systolic' in r]
-    diastolic_values = [r['diastolic'] for r in readings if 'diastolic' in r]
+    # Sum the 7 most recent values and the 7 before them in one pass (readings are newest first)
+    systolic_recent = systolic_older = 0.0
+    diastolic_recent = diastolic_older = 0.0
+    systolic_count = diastolic_count = 0
+    
+    for reading in readings:
+        value = reading.get('systolic')
+        if value is not None:
+            if systolic_count < 7:
+                systolic_recent += value
+            elif systolic_count < 14:
+                systolic_older += value
+            systolic_count += 1
+        
+        value = reading.get('diastolic')
+        if value is not None:
+            if diastolic_count < 7:
+                diastolic_recent += value
+            elif diastolic_count < 14:
+                diastolic_older += value
+            diastolic_count += 1
+        
+        if systolic_count >= 14 and diastolic_count >= 14:
+            break
     
     trends = {}
     
-    if systolic_values:
-        recent_systolic = systolic_values[:7] if len(systolic_values) >= 7 else systolic_values
-        trends['recent_avg_systolic'] = round(statistics.mean(recent_systolic), 1)
+    if systolic_count:
+        trends['recent_avg_systolic'] = round(systolic_recent / min(systolic_count, 7), 1)
         
-        if len(systolic_values) >= 14:
-            older_systolic = systolic_values[7:14]
-            diff = trends['recent_avg_systolic'] - statistics.mean(older_systolic)
+        if systolic_count >= 14:
+            diff = trends['recent_avg_systolic'] - systolic_older / 7
             if abs(diff) < 5:
                 trends['systolic_trend'] = 'stable'
             elif diff > 0:
@@ -427,13 +694,11 @@ def calculate_bp_trends(readings: List[Dict]) -> Dict:
         else:
             trends['systolic_trend'] = 'stable'
     
-    if diastolic_values:
-        recent_diastolic = diastolic_values[:7] if len(diastolic_values) >= 7 else diastolic_values
-        trends['recent_avg_diastolic'] = round(statistics.mean(recent_diastolic), 1)
+    if diastolic_count:
+        trends['recent_avg_diastolic'] = round(diastolic_recent / min(diastolic_count, 7), 1)
         
-        if len(diastolic_values) >= 14:
-            older_diastolic = diastolic_values[7:14]
-            diff = trends['recent_avg_diastolic'] - statistics.mean(older_diastolic)
+        if diastolic_count >= 14:
+            diff = trends['recent_avg_diastolic'] - diastolic_older / 7
             if abs(diff) < 3:
                 trends['diastolic_trend'] = 'stable'
             elif diff > 0:
@@ -451,17 +716,13 @@ def calculate_hrv_trends(daily_averages: List[Dict]) -> Dict:
     if len(daily_averages) < 2:
         return {'recent_avg': None, 'trend': 'insufficient_data'}
     
-    # Get recent average (last 7 days)
-    recent_days = daily_averages[-7:]
-    recent_avg = statistics.mean([d['avg'] for d in recent_days])
+    # Recent average (last 7 days) and first/second half of the last 14 days
+    recent_avg, first_avg, second_avg = window_means(
+        np.array([d['avg'] for d in daily_averages[-14:]], dtype=np.float64)
+    )
     
     # Calculate trend
     if len(daily_averages) >= 14:
-        first_half = daily_averages[-14:-7]
-        second_half = daily_averages[-7:]
-        first_avg = statistics.mean([d['avg'] for d in first_half])
-        second_avg = statistics.mean([d['avg'] for d in second_half])
-        
         diff = second_avg - first_avg
         if abs(diff) < 5:
             trend = 'stable'
@@ -473,7 +734,7 @@ def calculate_hrv_trends(daily_averages: List[Dict]) -> Dict:
         trend = 'stable'
     
     return {
-        'recent_avg': round(recent_avg, 1),
+        'recent_avg': round(float(recent_avg), 1),
         'trend': trend
     }
 
@@ -489,8 +750,9 @@ def process_all_mobile_data(directory_path: Path, date_offset_days: int = 0) ->
     Returns:
         Processed data dictionary
     """
-    print("Loading raw mobile data...")
-    raw_data = load_raw_mobile_data(directory_path)
+    # Records are streamed from disk inside each worker, never held all at once
+    print("Scanning raw mobile data...")
+    raw_data = stream_raw_mobile_data(directory_path)
     
     if not raw_data:
         print("No data loaded.")
@@ -499,39 +761,69 @@ def process_all_mobile_data(directory_path: Path, date_offset_days: int = 0) ->
     if date_offset_days != 0:
         print(f"Applying date offset: +{date_offset_days} days to shift data to recent dates")
     
-    print("\nProcessing heart rate data...")
-    heart_rate = process_heart_rate_data(raw_data.get('heart_rate', []), date_offset_days)
-    
-    print("Processing blood pressure data...")
-    blood_pressure = process_blood_pressure_data(
-        raw_data.get('blood_pressure_systolic', []),
-        raw_data.get('blood_pressure_diastolic', []),
-        date_offset_days
-    )
+    # Files are independent, so parse them in parallel worker processes (one task
+    # per file); the parent only merges the partial results in file order
+    print("\nProcessing heart rate, blood pressure, HRV and activity data...")
+    jobs = [
+        (category, path)
+        for category in _AGGREGATED_CATEGORIES if category in raw_data
+        for path in raw_data[category].files
+    ]
+    partials = {category: [] for category in _AGGREGATED_CATEGORIES}
+    if jobs:
+        mp_context = multiprocessing.get_context('spawn') if sys.platform == 'win32' else None
+        max_workers = min(len(jobs), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as pool:
+            for (category, _), partial in zip(jobs, pool.map(_process_one_file, *zip(*jobs))):
+                partials[category].append(partial)
+    
+    if 'heart_rate' in raw_data:
+        hr_parts = partials['heart_rate']
+        heart_rate = _summarize_heart_rate(
+            *_concat_partials(hr_parts),
+            [sample for part in hr_parts for sample in part[2]],
+            date_offset_days
+        )
+    else:
+        heart_rate = process_heart_rate_data([], date_offset_days)
+    print("Processed heart rate data")
+    
+    if 'blood_pressure_systolic' in raw_data or 'blood_pressure_diastolic' in raw_data:
+        blood_pressure = _summarize_blood_pressure(
+            partials['blood_pressure_systolic'],
+            partials['blood_pressure_diastolic'],
+            date_offset_days
+        )
+    else:
+        blood_pressure = process_blood_pressure_data([], [], date_offset_days)
+    print("Processed blood pressure data")
     
-    print("Processing HRV data...")
-    hrv = process_hrv_data(raw_data.get('hrv', []), date_offset_days)
+    if 'hrv' in raw_data:
+        hrv = _summarize_hrv(*_concat_partials(partials['hrv']), date_offset_days)
+    else:
+        hrv = process_hrv_data([], date_offset_days)
+    print("Processed HRV data")
     
-    print("Processing activity data...")
-    steps_daily = calculate_daily_aggregates(raw_data.get('daily_steps', []), 'Value', date_offset_days)
+    if 'daily_steps' in raw_data:
+        steps_daily = _summarize_daily_aggregates(*_concat_partials(partials['daily_steps']), date_offset_days)
+    else:
+        steps_daily = calculate_daily_aggregates([], _VALUE, date_offset_days)
+    print("Processed activity data")
     
-    # Determine date range
-    all_dates = []
-    if heart_rate['daily_stats']:
-        all_dates.extend([d['date'] for d in heart_rate['daily_stats']])
-    if steps_daily:
-        all_dates.extend([d['date'] for d in steps_daily])
+    # Determine date range (daily lists are already in ascending date order)
+    daily_lists = [daily for daily in (heart_rate['daily_stats'], steps_daily) if daily]
+    all_dates = {d['date'] for daily in daily_lists for d in daily}
     
     date_range = {}
-    if all_dates:
+    if daily_lists:
         date_range = {
-            'start': min(all_dates),
-            'end': max(all_dates)
+            'start': min(daily[0]['date'] for daily in daily_lists),
+            'end': max(daily[-1]['date'] for daily in daily_lists)
         }
     
     # Build final structure
     processed_data = {
-        'last_updated': datetime.now().isoformat(),
+        'last_updated': datetime.now(),  # serialized as ISO 8601 by orjson
         'date_range': date_range,
         'heart_data': {
             'heart_rate': heart_rate,
@@ -542,7 +834,7 @@ def process_all_mobile_data(directory_path: Path, date_offset_days: int = 0) ->
             'daily_steps': steps_daily
         },
         'metadata': {
-            'total_days': len(set(all_dates)) if all_dates else 0,
+            'total_days': len(all_dates),
             'categories_processed': list(raw_data.keys())
         }
     }
@@ -554,11 +846,67 @@ def process_all_mobile_data(directory_path: Path, date_offset_days: int = 0) ->
     return processed_data
 
 
-def save_processed_data(data: Dict, output_path: Path):
-    """Save processed data to JSON file."""
+def _json_default(obj):
+    """Encode the non-JSON types orjson handles natively (stdlib fallback only)."""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (np.generic, np.ndarray)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def records_to_columns(records: List[Dict]) -> Dict[str, List]:
+    """
+    Store a list of records column-wise (field name -> values).
+    All records must share the same fields, as the per-day lists do.
+    """
+    if not records:
+        return {}
+    return {key: [record[key] for record in records] for key in records[0]}
+
+
+def _with_columnar_sections(data: Dict) -> Dict:
+    """Copy of data with the COLUMNAR_SECTIONS record lists stored column-wise (data is not modified)."""
+    data = dict(data)
+    for *parents, key in COLUMNAR_SECTIONS:
+        section = data
+        for name in parents:
+            child = section.get(name)
+            if not isinstance(child, dict):
+                break
+            section[name] = dict(child)
+            section = section[name]
+        else:
+            if key in section:
+                section[key] = records_to_columns(section[key])
+    return data
+
+
+def save_processed_data(data: Dict, output_path: Path) -> bytes:
+    """
+    Save processed data to JSON file.
+    Per-day record lists are written column-wise; read the file back with
+    mobile_data_retriever.load_processed_data to get record lists again.
+    
+    Returns:
+        The encoded JSON exactly as written, so callers need not re-read the file
+    """
     output_path.parent.mkdir(parents=True, exist_ok=True)
+    data = _with_columnar_sections(data)
+    
+    if orjson is not None:
+        data_bytes = orjson.dumps(
+            data,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    else:
+        data_bytes = json.dumps(data, indent=2, default=_json_default).encode('utf-8')
+    
+    with open(output_path, 'wb') as f:
+        f.write(data_bytes)
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    # Cached retrieval results were built from the previous data
+    invalidate_mobile_data_cache()
     
     print(f"\nSaved processed data to: {output_path}")
+    return data_bytes
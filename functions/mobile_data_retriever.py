@@ -6,7 +6,22 @@ Retrieves relevant mobile health data based on user queries using keyword matchi
 
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
+from bisect import bisect_left
+import json
+import mmap
+import os
 import re
+import threading
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional; fall back to substring scans
+    ahocorasick = None
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib decoder in load_processed_data
+    orjson = None
 
 
 # Keyword categories for different data types
@@ -47,6 +62,82 @@ TREND_KEYWORDS = [
     'decreasing', 'stable', 'pattern', 'patterns'
 ]
 
+# Category bit flags returned by scan_query
+CATEGORY_HEART_RATE = 1
+CATEGORY_BLOOD_PRESSURE = 2
+CATEGORY_HRV = 4
+CATEGORY_ACTIVITY = 8
+CATEGORY_TREND = 16
+
+MOBILE_DATA_CATEGORIES = (
+    CATEGORY_HEART_RATE | CATEGORY_BLOOD_PRESSURE | CATEGORY_HRV | CATEGORY_ACTIVITY
+)
+
+TIME_DAY_RE = re.compile(r'last (\d+) days?')
+TIME_WEEK_RE = re.compile(r'last (\d+) weeks?')
+
+
+def _build_keyword_table() -> Dict[str, Tuple[int, Optional[int]]]:
+    """
+    Map every keyword to (category_mask, time_priority).
+    time_priority is the phrase's position in TIME_KEYWORDS, or None.
+    """
+    table = {}
+    for mask, keywords in (
+        (CATEGORY_HEART_RATE, HEART_RATE_KEYWORDS),
+        (CATEGORY_BLOOD_PRESSURE, BLOOD_PRESSURE_KEYWORDS),
+        (CATEGORY_HRV, HRV_KEYWORDS),
+        (CATEGORY_ACTIVITY, ACTIVITY_KEYWORDS),
+        (CATEGORY_TREND, TREND_KEYWORDS),
+    ):
+        for keyword in keywords:
+            current_mask, priority = table.get(keyword, (0, None))
+            table[keyword] = (current_mask | mask, priority)
+    
+    for priority, time_phrase in enumerate(TIME_KEYWORDS):
+        current_mask, _ = table.get(time_phrase, (0, None))
+        table[time_phrase] = (current_mask, priority)
+    
+    return table
+
+
+_KEYWORD_TABLE = _build_keyword_table()
+_TIME_PHRASES = list(TIME_KEYWORDS)
+
+if ahocorasick is not None:
+    _KEYWORD_AUTOMATON = ahocorasick.Automaton()
+    for _keyword, _entry in _KEYWORD_TABLE.items():
+        _KEYWORD_AUTOMATON.add_word(_keyword, _entry)
+    _KEYWORD_AUTOMATON.make_automaton()
+else:
+    _KEYWORD_AUTOMATON = None
+
+
+def scan_query(query_lower: str) -> Tuple[int, Optional[int]]:
+    """
+    Scan a lowercased query for all keyword categories in a single pass.
+    
+    Returns:
+        Tuple of (category_mask, time_days)
+        - category_mask: OR of the CATEGORY_* flags whose keywords occur in the query
+        - time_days: Days for the first matching TIME_KEYWORDS phrase, or None
+    """
+    mask = 0
+    best_priority = None
+    
+    if _KEYWORD_AUTOMATON is not None:
+        matches = (entry for _, entry in _KEYWORD_AUTOMATON.iter(query_lower))
+    else:
+        matches = (entry for keyword, entry in _KEYWORD_TABLE.items() if keyword in query_lower)
+    
+    for keyword_mask, priority in matches:
+        mask |= keyword_mask
+        if priority is not None and (best_priority is None or priority < best_priority):
+            best_priority = priority
+    
+    time_days = TIME_KEYWORDS[_TIME_PHRASES[best_priority]] if best_priority is not None else None
+    return mask, time_days
+
 
 def contains_keywords(query: str, keywords: List[str]) -> bool:
     """Check if query contains any of the keywords."""
@@ -54,35 +145,45 @@ def contains_keywords(query: str, keywords: List[str]) -> bool:
     return any(keyword in query_lower for keyword in keywords)
 
 
-def extract_time_range(query: str) -> Optional[int]:
-    """
-    Extract time range from query in days.
-    Returns number of days to look back, or None if not specified.
-    """
-    query_lower = query.lower()
-    
-    for time_phrase, days in TIME_KEYWORDS.items():
-        if time_phrase in query_lower:
-            return days
+def _parse_time_range(query_lower: str, time_days: Optional[int]) -> Optional[int]:
+    """Resolve the look-back window from a matched time phrase or a 'last N days/weeks' pattern."""
+    if time_days is not None:
+        return time_days
     
     # Check for specific day numbers
-    day_match = re.search(r'last (\d+) days?', query_lower)
+    day_match = TIME_DAY_RE.search(query_lower)
     if day_match:
         return int(day_match.group(1))
     
-    week_match = re.search(r'last (\d+) weeks?', query_lower)
+    week_match = TIME_WEEK_RE.search(query_lower)
     if week_match:
         return int(week_match.group(1)) * 7
     
     return None
 
 
+def extract_time_range(query: str) -> Optional[int]:
+    """
+    Extract time range from query in days.
+    Returns number of days to look back, or None if not specified.
+    """
+    query_lower = query.lower()
+    _, time_days = scan_query(query_lower)
+    return _parse_time_range(query_lower, time_days)
+
+
+def _date_of(item: Dict) -> str:
+    """Sort key for date-ordered data items."""
+    return item.get('date', '')
+
+
 def filter_by_date_range(data_list: List[Dict], days_back: int) -> List[Dict]:
     """
     Filter data list by date range.
     
     Args:
-        data_list: List of data items with 'date' field
+        data_list: List of data items with 'date' field, sorted by date ascending
+                   (as emitted by the mobile data processor)
         days_back: Number of days to look back from now
         
     Returns:
@@ -93,8 +194,9 @@ def filter_by_date_range(data_list: List[Dict], days_back: int) -> List[Dict]:
     
     cutoff_date = (datetime.now() - timedelta(days=days_back)).strftime("%Y-%m-%d")
     
-    filtered = [item for item in data_list if item.get('date', '') >= cutoff_date]
-    return filtered
+    # Dates are ISO strings, so lexicographic order is chronological order
+    start = bisect_left(data_list, cutoff_date, key=_date_of)
+    return data_list[start:]
 
 
 def needs_mobile_data(query: str) -> bool:
@@ -107,14 +209,84 @@ def needs_mobile_data(query: str) -> bool:
     Returns:
         True if mobile data is needed, False otherwise
     """
-    all_keywords = (
-        HEART_RATE_KEYWORDS + 
-        BLOOD_PRESSURE_KEYWORDS + 
-        HRV_KEYWORDS + 
-        ACTIVITY_KEYWORDS
-    )
+    mask, _ = scan_query(query.lower())
+    return bool(mask & MOBILE_DATA_CATEGORIES)
+
+
+# Record lists that save_processed_data stores column-wise ({'date': [...], 'avg': [...], ...}),
+# so each field name is written once per list rather than once per day
+COLUMNAR_SECTIONS = (
+    ('heart_data', 'heart_rate', 'daily_stats'),
+    ('heart_data', 'heart_rate', 'recent_samples'),
+    ('heart_data', 'hrv', 'daily_averages'),
+    ('activity_data', 'daily_steps'),
+)
+
+
+def columns_to_records(columns) -> List[Dict]:
+    """
+    Rebuild a list of records from its column-wise form.
+    
+    Args:
+        columns: Dict of field name to values, or a list already in record form
+                 (files written before the columnar layout), returned unchanged
+        
+    Returns:
+        List of dicts with the fields in column order
+    """
+    if isinstance(columns, list):
+        return columns
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+def load_processed_data(path) -> Dict:
+    """
+    Load processed mobile data, restoring the columnar sections to record lists.
     
-    return contains_keywords(query, all_keywords)
+    Args:
+        path: Path to processed_mobile_data.json
+        
+    Returns:
+        Processed data in the layout returned by process_all_mobile_data
+    """
+    with open(path, 'rb') as f:
+        if orjson is not None and os.fstat(f.fileno()).st_size:
+            # Parse straight from the page cache instead of copying the file into a bytes object
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                data = orjson.loads(view)
+        else:
+            raw = f.read()
+            data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    
+    for *parents, key in COLUMNAR_SECTIONS:
+        section = data
+        for name in parents:
+            section = section.get(name)
+            if not isinstance(section, dict):
+                break
+        else:
+            if key in section:
+                section[key] = columns_to_records(section[key])
+    
+    return data
+
+
+# Retrieval results keyed by (id(processed_data), version, today, days_back, mask, needs_trends).
+# Each entry holds a reference to its data object, so that id cannot be reused by another
+# object while the entry lives; a new data object, an invalidation or a new day (date
+# filters are relative to now) all miss. Oldest entries are evicted first.
+_RETRIEVAL_CACHE_SIZE = 128
+_retrieval_cache: Dict[Tuple, Tuple[Dict, Tuple[bool, Dict, str]]] = {}
+_retrieval_cache_lock = threading.Lock()
+_cache_version = 0
+
+
+def invalidate_mobile_data_cache():
+    """Drop cached retrieval results (call whenever processed data is regenerated)."""
+    global _cache_version
+    with _retrieval_cache_lock:
+        _cache_version += 1
+        _retrieval_cache.clear()
 
 
 def retrieve_relevant_mobile_data(query: str, processed_data: Dict) -> Tuple[bool, Dict, str]:
@@ -130,22 +302,50 @@ def retrieve_relevant_mobile_data(query: str, processed_data: Dict) -> Tuple[boo
         - needs_data: Whether mobile data is relevant to the query
         - retrieved_data: Dictionary of relevant data
         - formatted_string: Human-readable formatted data for AI context
+        
+    Results are cached per (days_back, categories, trends) for the current day,
+    so retrieved_data must be treated as read-only.
     """
     if not processed_data:
         return False, {}, ""
     
+    # Match every keyword category in one pass over the query
+    query_lower = query.lower()
+    mask, time_days = scan_query(query_lower)
+    
     # Check if mobile data is needed
-    if not needs_mobile_data(query):
+    if not mask & MOBILE_DATA_CATEGORIES:
         return False, {}, ""
     
     # Extract time range
-    days_back = extract_time_range(query)
+    days_back = _parse_time_range(query_lower, time_days)
     if days_back is None:
         days_back = 7  # Default to last 7 days
     
     # Check for trend analysis request
-    needs_trends = contains_keywords(query, TREND_KEYWORDS)
+    needs_trends = bool(mask & CATEGORY_TREND)
+    
+    mask &= MOBILE_DATA_CATEGORIES
+    today = datetime.now().strftime("%Y-%m-%d")
+    key = (id(processed_data), _cache_version, today, days_back, mask, needs_trends)
+    
+    with _retrieval_cache_lock:
+        entry = _retrieval_cache.get(key)
+    if entry is not None and entry[0] is processed_data:
+        return entry[1]
     
+    result = _build_formatted(processed_data, days_back, mask, needs_trends)
+    
+    with _retrieval_cache_lock:
+        if key not in _retrieval_cache and len(_retrieval_cache) >= _RETRIEVAL_CACHE_SIZE:
+            _retrieval_cache.pop(next(iter(_retrieval_cache)))
+        _retrieval_cache[key] = (processed_data, result)
+    return result
+
+
+def _build_formatted(processed_data: Dict, days_back: int, mask: int,
+                     needs_trends: bool) -> Tuple[bool, Dict, str]:
+    """Filter and format the requested categories of processed_data."""
     retrieved_data = {}
     formatted_parts = []
     
@@ -153,7 +353,7 @@ def retrieve_relevant_mobile_data(query: str, processed_data: Dict) -> Tuple[boo
     activity_data = processed_data.get('activity_data', {})
     
     # Heart Rate Data
-    if contains_keywords(query, HEART_RATE_KEYWORDS):
+    if mask & CATEGORY_HEART_RATE:
         hr_info = heart_data.get('heart_rate', {})
         if hr_info:
             daily_stats = filter_by_date_range(hr_info.get('daily_stats', []), days_back)
@@ -166,7 +366,7 @@ def retrieve_relevant_mobile_data(query: str, processed_data: Dict) -> Tuple[boo
             formatted_parts.append(format_heart_rate_data(daily_stats, hr_info.get('trends', {}), needs_trends))
     
     # Blood Pressure Data
-    if contains_keywords(query, BLOOD_PRESSURE_KEYWORDS):
+    if mask & CATEGORY_BLOOD_PRESSURE:
         bp_info = heart_data.get('blood_pressure', {})
         if bp_info:
             readings = bp_info.get('readings', [])
@@ -181,7 +381,7 @@ def retrieve_relevant_mobile_data(query: str, processed_data: Dict) -> Tuple[boo
             formatted_parts.append(format_blood_pressure_data(filtered_readings, bp_info.get('trends', {}), needs_trends))
     
     # HRV Data
-    if contains_keywords(query, HRV_KEYWORDS):
+    if mask & CATEGORY_HRV:
         hrv_info = heart_data.get('hrv', {})
         if hrv_info:
             daily_avgs = filter_by_date_range(hrv_info.get('daily_averages', []), days_back)
@@ -194,7 +394,7 @@ def retrieve_relevant_mobile_data(query: str, processed_data: Dict) -> Tuple[boo
             formatted_parts.append(format_hrv_data(daily_avgs, hrv_info.get('trends', {}), needs_trends))
     
     # Activity Data
-    if contains_keywords(query, ACTIVITY_KEYWORDS):
+    if mask & CATEGORY_ACTIVITY:
         steps_data = activity_data.get('daily_steps', [])
         if steps_data:
             filtered_steps = filter_by_date_range(steps_data, days_back)
@@ -222,10 +422,9 @@ def format_heart_rate_data(daily_stats: List[Dict], trends: Dict, include_trends
     output = ["HEART RATE DATA:"]
     
     # Recent summary
-    recent_values = [d['avg'] for d in daily_stats[-7:]]
-    if recent_values:
-        avg = sum(recent_values) / len(recent_values)
-        output.append(f"  Recent 7-day average: {avg:.1f} bpm")
+    recent_days = daily_stats[-7:]
+    avg = sum(d['avg'] for d in recent_days) / len(recent_days)
+    output.append(f"  Recent 7-day average: {avg:.1f} bpm")
     
     # Trends if requested
     if include_trends and trends:
@@ -251,16 +450,23 @@ def format_blood_pressure_data(readings: List[Dict], trends: Dict, include_trend
     
     output = ["BLOOD PRESSURE DATA:"]
     
-    # Recent averages
-    systolic_values = [r['systolic'] for r in readings if 'systolic' in r]
-    diastolic_values = [r['diastolic'] for r in readings if 'diastolic' in r]
-    
-    if systolic_values:
-        avg_sys = sum(systolic_values) / len(systolic_values)
-        output.append(f"  Average systolic: {avg_sys:.1f} mmHg")
-    if diastolic_values:
-        avg_dia = sum(diastolic_values) / len(diastolic_values)
-        output.append(f"  Average diastolic: {avg_dia:.1f} mmHg")
+    # Recent averages (single pass over both components)
+    systolic_sum = diastolic_sum = 0.0
+    systolic_count = diastolic_count = 0
+    for reading in readings:
+        value = reading.get('systolic')
+        if value is not None:
+            systolic_sum += value
+            systolic_count += 1
+        value = reading.get('diastolic')
+        if value is not None:
+            diastolic_sum += value
+            diastolic_count += 1
+    
+    if systolic_count:
+        output.append(f"  Average systolic: {systolic_sum / systolic_count:.1f} mmHg")
+    if diastolic_count:
+        output.append(f"  Average diastolic: {diastolic_sum / diastolic_count:.1f} mmHg")
     
     # Trends if requested
     if include_trends and trends:
@@ -288,10 +494,9 @@ def format_hrv_data(daily_averages: List[Dict], trends: Dict, include_trends: bo
     output = ["HEART RATE VARIABILITY (HRV) DATA:"]
     
     # Recent summary
-    recent_values = [d['avg'] for d in daily_averages[-7:]]
-    if recent_values:
-        avg = sum(recent_values) / len(recent_values)
-        output.append(f"  Recent 7-day average: {avg:.1f} ms")
+    recent_days = daily_averages[-7:]
+    avg = sum(d['avg'] for d in recent_days) / len(recent_days)
+    output.append(f"  Recent 7-day average: {avg:.1f} ms")
     
     # Trends if requested
     if include_trends and trends:
@@ -316,13 +521,21 @@ def format_activity_data(daily_steps: List[Dict]) -> str:
     
     output = ["ACTIVITY DATA (Daily Steps):"]
     
-    # Summary
-    step_counts = [d['sum'] for d in daily_steps]
-    if step_counts:
-        avg_steps = sum(step_counts) / len(step_counts)
-        output.append(f"  Average daily steps: {avg_steps:.0f}")
-        output.append(f"  Highest: {max(step_counts):.0f} steps")
-        output.append(f"  Lowest: {min(step_counts):.0f} steps")
+    # Summary (sum/min/max in a single pass)
+    total = 0.0
+    highest = float('-inf')
+    lowest = float('inf')
+    for stat in daily_steps:
+        steps = stat['sum']
+        total += steps
+        if steps > highest:
+            highest = steps
+        if steps < lowest:
+            lowest = steps
+    
+    output.append(f"  Average daily steps: {total / len(daily_steps):.0f}")
+    output.append(f"  Highest: {highest:.0f} steps")
+    output.append(f"  Lowest: {lowest:.0f} steps")
     
     # Daily breakdown (last 7 days)
     output.append("\n  Daily breakdown:")
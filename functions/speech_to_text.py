@@ -8,50 +8,156 @@ Installation:
 """
 
 import threading
-import queue
 import time
 import os
-from typing import Callable, Optional, List
+import contextlib
+import re
+import ctypes.util
+import importlib.util
+import platform
+import urllib.request
+import zipfile
+from collections import deque
+from typing import Callable, Optional, List, Tuple
+import numpy as np
+from pywhispercpp.constants import MODELS_DIR
 from pywhispercpp.examples.assistant import Assistant
+from pywhispercpp.model import Model
+from pywhispercpp.utils import download_model
+
+COREML_ENCODER_URL = "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-{model}-encoder.mlmodelc.zip"
+
+
+def _resolve_model(model: str, quantization: Optional[str]) -> str:
+    """
+    Resolve a whisper.cpp model name to its quantized GGML file (e.g. base.en-q5_1).
+
+    Quantized weights roughly halve the memory traffic of each decoder step on CPU;
+    for large models INT4 cuts max RSS from ~3.9 GB to ~1.8 GB. Falls back to the
+    unquantized model when no quantized variant exists or it cannot be downloaded.
+    """
+    if not quantization or os.path.isfile(model):
+        return model
+    try:
+        # Returns None for names whisper.cpp does not publish
+        path = download_model(f"{model}-{quantization}")
+    except OSError:
+        path = None
+    if not path or not os.path.isfile(path):
+        print(f"Quantized model {model}-{quantization} not available, using {model}")
+        return model
+    return path
+
+
+@contextlib.contextmanager
+def _silence_stderr(enabled: bool = True):
+    """
+    Point file descriptor 2 at /dev/null for the duration of the block, so native
+    whisper.cpp model-loading logs are hidden. stderr is restored even on error.
+    """
+    if not enabled:
+        yield
+        return
+    saved = os.dup(2)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    try:
+        os.dup2(devnull, 2)
+        yield
+    finally:
+        os.dup2(saved, 2)
+        os.close(devnull)
+        os.close(saved)
+
+
+def _has_faster_whisper() -> bool:
+    """Whether the optional faster-whisper (CTranslate2) package is installed"""
+    return importlib.util.find_spec("faster_whisper") is not None
+
+
+def _select_backend() -> str:
+    """
+    Pick the inference backend for this machine.
+
+    Returns:
+        "coreml" on macOS (whisper.cpp runs the encoder on the Neural Engine when built
+        with CoreML support), "cuda" on Linux with an NVIDIA driver and faster-whisper
+        installed, otherwise "cpu"
+    """
+    system = platform.system()
+    if system == "Darwin":
+        return "coreml"
+    if system == "Linux" and ctypes.util.find_library("cuda") and _has_faster_whisper():
+        return "cuda"
+    return "cpu"
+
+
+def _ensure_coreml_encoder(model: str) -> None:
+    """
+    Download the CoreML encoder that whisper.cpp looks for next to the GGML model
+    (ggml-<model>-encoder.mlmodelc, shared by all quantizations of that model).
+    A CoreML-less whisper.cpp build ignores it; failures just leave inference on CPU.
+    """
+    if os.path.isfile(model):
+        models_dir = os.path.dirname(model)
+        name = os.path.basename(model)
+        name = name[len("ggml-"):] if name.startswith("ggml-") else name
+        name = re.sub(r"(-q\d_\d)?\.bin$", "", name)
+    else:
+        models_dir, name = str(MODELS_DIR), model
+    
+    encoder_path = os.path.join(models_dir, f"ggml-{name}-encoder.mlmodelc")
+    if os.path.isdir(encoder_path):
+        return
+    try:
+        os.makedirs(models_dir, exist_ok=True)
+        archive, _ = urllib.request.urlretrieve(COREML_ENCODER_URL.format(model=name))
+        with zipfile.ZipFile(archive) as zf:
+            zf.extractall(models_dir)
+        os.remove(archive)
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"CoreML encoder for {name} not available ({e}), using CPU encoder")
 
 
 class SimpleTTSController:
     """Simplified Text-to-Speech controller using pywhispercpp"""
     
     def __init__(self, on_text_received: Callable[[str], None], 
-                 model='base.en', n_threads=8, silence_threshold=12, block_duration=30):
+                 model='base.en', n_threads=8, silence_threshold=12, block_duration=30,
+                 quantization: str = "q5_1", quiet: bool = True):
+        # Not called directly: text is only queued, and SpeechToText drains the queue
+        # (process_pending_audio / wait_for_text) so each utterance is recorded once
         self.on_text_received = on_text_received
-        self.text_queue = queue.Queue()
+        # Single producer (the Assistant thread) and single consumer; deque
+        # append/popleft are atomic under the GIL, so no lock is needed
+        self.text_queue = deque()
+        self.text_ready = threading.Event()
+        model = _resolve_model(model, quantization)
         
-        # Initialize the Assistant with voice recognition
-        stderr = os.dup(2)
-        os.close(2)
-        os.open(os.devnull, os.O_RDWR)
-        try:
-            self.assistant = Assistant(
-                model=model,
-                commands_callback=self._queue_text,
-                n_threads=n_threads,
-                silence_threshold=silence_threshold,
-                block_duration=block_duration,
-            )
-        except TypeError:
-            self.assistant = Assistant(
-                model=model,
-                commands_callback=self._queue_text,
-                n_threads=n_threads,
-            )
-        finally:
-            os.dup2(stderr, 2)
-            os.close(stderr)
+        # Initialize the Assistant with voice recognition (quiet hides whisper.cpp's load logs)
+        with _silence_stderr(enabled=quiet):
+            try:
+                self.assistant = Assistant(
+                    model=model,
+                    commands_callback=self._queue_text,
+                    n_threads=n_threads,
+                    silence_threshold=silence_threshold,
+                    block_duration=block_duration,
+                )
+            except TypeError:
+                self.assistant = Assistant(
+                    model=model,
+                    commands_callback=self._queue_text,
+                    n_threads=n_threads,
+                )
         
         self.thread = None
         self.running = False
 
     def _queue_text(self, text: str):
-        """Queue transcribed text for processing"""
+        """Queue transcribed text for processing (the only delivery path)"""
         if isinstance(text, str) and text.strip():
-            self.text_queue.put(text.strip())
+            self.text_queue.append(text.strip())
+            self.text_ready.set()
 
     def start(self):
         """Start the voice recognition in a separate thread"""
@@ -60,44 +166,196 @@ class SimpleTTSController:
         self.thread.start()
         print("🎤 Voice recognition started")
 
+    def get_latest_text(self) -> List[str]:
+        """Get any new transcribed text from the queue"""
+        texts = []
+        # popleft one item at a time: a copy-then-clear could drop text
+        # appended by the Assistant thread in between
+        try:
+            while True:
+                texts.append(self.text_queue.popleft())
+        except IndexError:
+            pass
+        return texts
+
+    def wait_for_text(self, timeout: float = 1.0) -> List[str]:
+        """Block until new text is queued (or timeout) and return it"""
+        if not self.text_ready.wait(timeout):
+            return []
+        # Clear before draining so text queued during the drain re-signals
+        self.text_ready.clear()
+        return self.get_latest_text()
+
+    def stop(self):
+        """Stop the voice recognition"""
+        self.running = False
+
+
+class FasterWhisperController:
+    """Text-to-Speech controller using faster-whisper (CTranslate2), same API as SimpleTTSController"""
+    
+    SAMPLE_RATE = 16000
+    MAX_UTTERANCE_SECONDS = 30  # Whisper's context window
+    
+    def __init__(self, on_text_received: Callable[[str], None],
+                 model='base.en', n_threads=8, silence_threshold=12, block_duration=30,
+                 device="cpu", compute_type="int8"):
+        # Optional dependencies, only needed for this backend
+        import sounddevice
+        import webrtcvad
+        from faster_whisper import WhisperModel
+        
+        # Not called directly: text is only queued, and SpeechToText drains the queue
+        # (process_pending_audio / wait_for_text) so each utterance is recorded once
+        self.on_text_received = on_text_received
+        self.text_queue = deque()
+        self.text_ready = threading.Event()
+        
+        self.model = WhisperModel(model, device=device, compute_type=compute_type, cpu_threads=n_threads)
+        self.vad = webrtcvad.Vad()
+        self.silence_threshold = silence_threshold  # silent blocks that end an utterance
+        self.block_size = int(self.SAMPLE_RATE * block_duration / 1000)
+        self.stream = sounddevice.InputStream(
+            samplerate=self.SAMPLE_RATE,
+            channels=1,
+            dtype="float32",
+            blocksize=self.block_size,
+            callback=self._audio_callback,
+        )
+        
+        # Speech blocks of the current utterance, and finished utterances for the worker
+        self._blocks = []
+        self._silence_counter = 0
+        self._utterances = deque()
+        self._utterance_ready = threading.Event()
+        
+        self.thread = None
+        self.running = False
+
+    def _audio_callback(self, indata, frames, time_info, status):
+        """Gate audio blocks with WebRTC VAD (runs on the audio thread, so keep it cheap)"""
+        block = indata[:, 0]
+        pcm = (np.clip(block, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+        if self.vad.is_speech(pcm, self.SAMPLE_RATE):
+            self._blocks.append(block.copy())
+            self._silence_counter = 0
+        elif self._blocks:
+            self._silence_counter += 1
+        
+        utterance_samples = len(self._blocks) * self.block_size
+        if self._blocks and (self._silence_counter >= self.silence_threshold
+                             or utterance_samples >= self.MAX_UTTERANCE_SECONDS * self.SAMPLE_RATE):
+            self._utterances.append(np.concatenate(self._blocks))
+            self._utterance_ready.set()
+            self._blocks = []
+            self._silence_counter = 0
+
+    def _transcribe_loop(self):
+        """Transcribe finished utterances off the audio thread"""
+        while self.running:
+            if not self._utterance_ready.wait(0.5):
+                continue
+            self._utterance_ready.clear()
+            while self._utterances:
+                audio = self._utterances.popleft()
+                segments, _ = self.model.transcribe(audio, beam_size=1, vad_filter=True)
+                self._queue_text("".join(segment.text for segment in segments))
+
+    def _queue_text(self, text: str):
+        """Queue transcribed text for processing (the only delivery path)"""
+        if isinstance(text, str) and text.strip():
+            self.text_queue.append(text.strip())
+            self.text_ready.set()
+
+    def start(self):
+        """Start the microphone stream and the transcription worker"""
+        self.running = True
+        self.thread = threading.Thread(target=self._transcribe_loop, daemon=True)
+        self.thread.start()
+        self.stream.start()
+        print("🎤 Voice recognition started")
+
     def get_latest_text(self) -> List[str]:
         """Get any new transcribed text from the queue"""
         texts = []
         try:
             while True:
-                text = self.text_queue.get_nowait()
-                texts.append(text)
-        except queue.Empty:
+                texts.append(self.text_queue.popleft())
+        except IndexError:
             pass
         return texts
 
+    def wait_for_text(self, timeout: float = 1.0) -> List[str]:
+        """Block until new text is queued (or timeout) and return it"""
+        if not self.text_ready.wait(timeout):
+            return []
+        self.text_ready.clear()
+        return self.get_latest_text()
+
     def stop(self):
         """Stop the voice recognition"""
         self.running = False
+        self.stream.stop()
+        self.stream.close()
 
 
 class SpeechToText:
     """Main class for speech-to-text transcription"""
     
-    def __init__(self, model='base.en', n_threads=8, silence_threshold=15, block_duration=30):
-        self.tts_controller = SimpleTTSController(
-            on_text_received=self._on_voice_text,
-            model=model,
-            n_threads=n_threads,
-            silence_threshold=silence_threshold,
-            block_duration=block_duration
-        )
-        self.transcription_history = []
+    def __init__(self, model='base.en', n_threads=8, silence_threshold=15, block_duration=30,
+                 quantization: str = "q5_1", backend: Optional[str] = None, history_cap: int = 1024):
+        # backend: "coreml", "cuda" or "cpu"; detected from the platform when None
+        self.backend = backend or _select_backend()
+        # whisper.cpp GGML file; only resolved (and possibly downloaded) when a
+        # whisper.cpp model is actually loaded, not for the faster-whisper backend
+        self.model = None
+        self._model_name = model
+        self._quantization = quantization
+        
+        # faster-whisper's int8 CTranslate2 kernels beat whisper.cpp on plain CPUs
+        # too, so it is preferred whenever installed; whisper.cpp is the fallback
+        use_faster_whisper = self.backend == "cuda" or (self.backend == "cpu" and _has_faster_whisper())
+        
+        if use_faster_whisper:
+            self.tts_controller = FasterWhisperController(
+                on_text_received=self._on_voice_text,
+                model=model,
+                n_threads=n_threads,
+                silence_threshold=silence_threshold,
+                block_duration=block_duration,
+                device="cuda" if self.backend == "cuda" else "cpu",
+                compute_type="int8_float16" if self.backend == "cuda" else "int8"
+            )
+        else:
+            self.model = _resolve_model(model, quantization)
+            if self.backend == "coreml":
+                _ensure_coreml_encoder(self.model)
+            self.tts_controller = SimpleTTSController(
+                on_text_received=self._on_voice_text,
+                model=self.model,
+                n_threads=n_threads,
+                silence_threshold=silence_threshold,
+                block_duration=block_duration,
+                quantization=None
+            )
+        print(f"Speech-to-text backend: {self.backend}")
+        # Bounded (timestamp, text) history; transcription_count keeps counting past
+        # the cap so pollers can tell which entries they have already seen
+        self.transcription_history = deque(maxlen=history_cap)
+        self.transcription_count = 0
+        
+        # Loaded on first transcribe_file call; kept separate from the live
+        # Assistant's model because a whisper context is not thread-safe
+        self._file_model = None
+        self._file_model_lock = threading.Lock()
 
     def _on_voice_text(self, text: str):
         """Callback when voice text is received"""
         print(f"Transcribed: {text}")
         
         # Store in transcription history
-        self.transcription_history.append({
-            "text": text,
-            "timestamp": time.time()
-        })
+        self.transcription_history.append((time.time(), text))
+        self.transcription_count += 1
 
     def start(self):
         """Start the speech-to-text transcription"""
@@ -110,9 +368,60 @@ class SpeechToText:
         for text in new_texts:
             self._on_voice_text(text)
 
-    def get_transcription_history(self) -> List[dict]:
-        """Get the transcription history"""
-        return self.transcription_history.copy()
+    def wait_for_text(self, timeout: float = 1.0) -> List[str]:
+        """Wait up to timeout seconds for new transcriptions and record them"""
+        new_texts = self.tts_controller.wait_for_text(timeout)
+        for text in new_texts:
+            self._on_voice_text(text)
+        return new_texts
+
+    def transcribe_file(self, path: str, n_processors: int = 4, n_threads: int = 2) -> str:
+        """
+        Transcribe an audio file, splitting it across n_processors parallel
+        decoders (whisper.cpp's whisper_full_parallel) that share one copy of
+        the model weights. whisper.cpp handles the chunking and stitching.
+        
+        Args:
+            path: Path to the audio file
+            n_processors: Number of audio chunks decoded in parallel
+            n_threads: Threads per decoder (n_processors * n_threads should fit the cores)
+            
+        Returns:
+            The transcribed text
+        """
+        with self._file_model_lock:
+            if self._file_model is None:
+                if self.model is None:
+                    self.model = _resolve_model(self._model_name, self._quantization)
+                self._file_model = Model(self.model, redirect_whispercpp_logs_to=None)
+            segments = self._file_model.transcribe(
+                path,
+                n_processors=n_processors if n_processors > 1 else None,
+                n_threads=n_threads
+            )
+        return " ".join(segment.text.strip() for segment in segments if segment.text.strip())
+
+    def get_transcription_history(self) -> List[Tuple[float, str]]:
+        """Get the transcription history as (timestamp, text) tuples, oldest first"""
+        return list(self.transcription_history)
+
+    def get_transcriptions_since(self, count: int) -> Tuple[List[str], int]:
+        """
+        Get texts transcribed after the first `count` transcriptions.
+        
+        Args:
+            count: transcription_count returned by the previous call (0 initially)
+            
+        Returns:
+            Tuple of (new texts, current transcription_count). Entries already
+            evicted by history_cap are skipped.
+        """
+        total = self.transcription_count
+        new = min(total - count, len(self.transcription_history))
+        if new <= 0:
+            return [], total
+        history = list(self.transcription_history)
+        return [text for _, text in history[-new:]], total
 
     def stop(self):
         """Stop the transcription"""
@@ -133,8 +442,8 @@ if __name__ == "__main__":
         print("Press Ctrl+C to stop...")
         
         while True:
-            transcriber.process_pending_audio()
-            time.sleep(0.5)  # Check every 500ms
+            # Wakes as soon as text arrives instead of polling every 500ms
+            transcriber.wait_for_text(timeout=1.0)
             
     except KeyboardInterrupt:
         print("\nStopping...")
@@ -144,6 +453,6 @@ if __name__ == "__main__":
         history = transcriber.get_transcription_history()
         if history:
             print("\nTranscription History:")
-            for i, entry in enumerate(history, 1):
-                print(f"{i}. {entry['text']}")
+            for i, (_, text) in enumerate(history, 1):
+                print(f"{i}. {text}")
 
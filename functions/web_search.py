@@ -1,37 +1,137 @@
 import os
+import asyncio
+import contextlib
 import openai
-from typing import Dict, Any, List, Annotated
-import json
+import httpx
+from functools import lru_cache
+from typing import Dict, Any, List, Annotated, Callable, Optional, Tuple
 import re
 import logging
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
+try:
+    import re2  # google-re2: linear-time DFA matching for long answer bodies
+except ImportError:  # fall back to the stdlib backtracking engine
+    re2 = re
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # bulk URL cleaning falls back to the per-URL regex
+    pa = None
+
 # Load environment variables
 load_dotenv()
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-def needs_web_search(query: str) -> bool:
+@lru_cache(maxsize=1)
+def _client() -> openai.OpenAI:
     """
-    Use a lightweight model to determine if a query requires web search.
-    
-    Args:
-        query (str): The user's query
-        
-    Returns:
-        bool: True if web search is needed, False otherwise
+    Shared OpenAI client, so every call reuses one connection pool
+    (HTTP/2 lets concurrent requests multiplex over a single connection).
+    """
+    return openai.OpenAI(
+        http_client=openai.DefaultHttpxClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=8)
+        )
+    )
+
+_search_loop: Optional[asyncio.AbstractEventLoop] = None
+_search_loop_lock = threading.Lock()
+
+def _get_search_loop() -> asyncio.AbstractEventLoop:
+    """
+    Long-lived event loop, run in a daemon thread, that owns the shared async client.
+    httpx async connection pools cannot be used across loops, so every async
+    request goes through this one loop instead of a fresh asyncio.run loop.
+    """
+    global _search_loop
+    with _search_loop_lock:
+        if _search_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="web-search-loop", daemon=True).start()
+            _search_loop = loop
+    return _search_loop
+
+async def _on_search_loop(coro):
+    """Await coro on the shared search loop (directly when already running there)."""
+    loop = _get_search_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+def run_on_search_loop(coro):
+    """Run coro on the shared search loop from synchronous code and return its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_search_loop()).result()
+
+@lru_cache(maxsize=1)
+def _async_client() -> openai.AsyncOpenAI:
     """
+    Shared async OpenAI client. Only use it on the shared search loop
+    (see _on_search_loop), which keeps its connection pool alive between queries.
+    """
+    return openai.AsyncOpenAI(
+        http_client=openai.DefaultAsyncHttpxClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=8)
+        )
+    )
+
+# Patterns compiled once at import (re2 when available; the URL and journal
+# patterns avoid lookarounds so both engines accept them)
+_URL_RE = re2.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+
+# Tracking parameters (with their values) and trailing punctuation stripped from cited URLs
+_CLEAN_URL_RE = re.compile(
+    r'[?&](utm_[a-z]+|fbclid|gclid)(?:=[^&#]*?)?(?=[&#]|[.,;!?)]*$)|[.,;!?)]+$'
+)
+
+# Journal patterns in priority order (the first pattern that matches anywhere wins,
+# which a single alternation scan would not preserve)
+_JOURNAL_RES = [
+    re2.compile(r'Published in: ([^\n]+)'),
+    re2.compile(r'Journal: ([^\n]+)'),
+    re2.compile(r'Published by ([^\n]+)'),
+    re2.compile(r'Source: ([^\n]+)')
+]
+
+# Optional local classifier (HashingVectorizer + LogisticRegression pipeline, label 1 = needs search),
+# trained offline with data/train_needs_search_clf.py. Confident predictions skip the LLM call.
+# Loading the pickled pipeline needs scikit-learn as well as joblib at runtime.
+NEEDS_SEARCH_CLF_PATH = Path(__file__).with_name("needs_search_clf.joblib")
+_LOCAL_CLF_CONFIDENCE = 0.85
+
+try:
+    import joblib
+    _needs_search_clf = joblib.load(NEEDS_SEARCH_CLF_PATH) if NEEDS_SEARCH_CLF_PATH.exists() else None
+except Exception as e:
+    logger.warning(f"Local web search classifier unavailable: {e}")
+    _needs_search_clf = None
+
+def _classify_locally(query: str) -> Optional[bool]:
+    """Return the local classifier's decision if it is confident, otherwise None."""
+    if _needs_search_clf is None:
+        return None
     try:
-        client = openai.OpenAI()
-        
-        # Use a very lightweight model for quick decision making
-        response = client.chat.completions.create(
-            model="gpt-4o",  # Fast and cheap model
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are a decision maker. Determine if a user query requires web search to answer accurately. When uncertain, default to YES since usually retrieving information from the web is helpful.
+        p_yes = _needs_search_clf.predict_proba([query])[0][1]
+    except Exception as e:
+        logger.warning(f"Local web search classifier failed: {e}")
+        return None
+    if p_yes >= _LOCAL_CLF_CONFIDENCE:
+        return True
+    if p_yes <= 1 - _LOCAL_CLF_CONFIDENCE:
+        return False
+    return None
+
+# System prompt for the YES/NO web search classifier
+_NEEDS_SEARCH_PROMPT = """You are a decision maker. Determine if a user query requires web search to answer accurately. When uncertain, default to YES since usually retrieving information from the web is helpful.
 
 Return ONLY "YES" for:
 - Current clinical guidelines, drug info, recalls, vaccines
@@ -47,72 +147,261 @@ Examples:
 - "What is hypertension?" → NO
 - "Drug recalls this month" → YES
 - "How to take blood pressure" → NO"""
-                },
-                {
-                    "role": "user",
-                    "content": f"Query: {query}"
-                }
-            ],
-            temperature=0,  # Low temperature for consistent decisions
-            max_tokens=3
-        )
+
+def _needs_search_request(query: str) -> Dict[str, Any]:
+    """Build the chat.completions arguments for the web search classifier."""
+    return {
+        # Use a very lightweight model for quick decision making
+        "model": "gpt-4o",  # Fast and cheap model
+        "messages": [
+            {"role": "system", "content": _NEEDS_SEARCH_PROMPT},
+            {"role": "user", "content": f"Query: {query}"}
+        ],
+        "temperature": 0,  # Low temperature for consistent decisions
+        # One decoder step: the decision is read from the first token's logprobs
+        "max_tokens": 1,
+        "logprobs": True,
+        "top_logprobs": 5
+    }
+
+def _needs_search_decision(response) -> bool:
+    """Compare the YES and NO logprobs of the classifier's first output token."""
+    choice = response.choices[0]
+    if choice.logprobs and choice.logprobs.content:
+        scores = {}
+        for candidate in choice.logprobs.content[0].top_logprobs:
+            token = candidate.token.strip().upper()
+            scores[token] = max(scores.get(token, -1e9), candidate.logprob)
+        # Ties (including neither token in the top 5) default to YES, like the prompt
+        return scores.get("YES", -1e9) >= scores.get("NO", -1e9)
+    # Logprobs unavailable: fall back to the sampled text
+    return (choice.message.content or "").strip().upper().startswith("YES")
+
+def needs_web_search(query: str) -> bool:
+    """
+    Use a lightweight model to determine if a query requires web search.
+    
+    Args:
+        query (str): The user's query
         
-        decision = response.choices[0].message.content.strip().upper()
-        return decision == "YES"
+    Returns:
+        bool: True if web search is needed, False otherwise
+    """
+    local_decision = _classify_locally(query)
+    if local_decision is not None:
+        return local_decision
+    
+    try:
+        client = _client()
+        response = client.chat.completions.create(**_needs_search_request(query))
+        return _needs_search_decision(response)
         
     except Exception as e:
         logger.error(f"Error in needs_web_search: {e}")
         return True
 
+async def needs_web_search_async(query: str) -> bool:
+    """Async variant of needs_web_search."""
+    local_decision = _classify_locally(query)
+    if local_decision is not None:
+        return local_decision
+    
+    try:
+        client = _async_client()
+        response = await _on_search_loop(client.chat.completions.create(**_needs_search_request(query)))
+        return _needs_search_decision(response)
+        
+    except Exception as e:
+        logger.error(f"Error in needs_web_search_async: {e}")
+        return True
+
+# Batch classification: numbered queries in, one "<n>. YES|NO" line per query out
+_NEEDS_SEARCH_BATCH_PROMPT = _NEEDS_SEARCH_PROMPT + """
+
+You will receive several numbered queries. For each numbered query, output its number followed by YES or NO on its own line, e.g. "1. YES"."""
+_NEEDS_SEARCH_BATCH_SIZE = 20
+_BATCH_DECISION_RE = re.compile(r'^\s*(\d+)\.\s*(YES|NO)\b', re.M | re.I)
+
+def needs_web_search_batch(queries: List[str]) -> List[bool]:
+    """
+    Classify several queries (e.g. drained transcriptions) with one request per
+    batch of up to 20 instead of one request per query.
+    
+    Args:
+        queries (List[str]): The user queries
+        
+    Returns:
+        List[bool]: One decision per query, in order (True if web search is needed)
+    """
+    decisions = [_classify_locally(query) for query in queries]
+    pending = [i for i, decision in enumerate(decisions) if decision is None]
+    
+    for start in range(0, len(pending), _NEEDS_SEARCH_BATCH_SIZE):
+        batch = pending[start:start + _NEEDS_SEARCH_BATCH_SIZE]
+        numbered = "\n".join(f"{n}. {queries[i]}" for n, i in enumerate(batch, 1))
+        answers = {}
+        try:
+            response = _client().chat.completions.create(
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": _NEEDS_SEARCH_BATCH_PROMPT},
+                    {"role": "user", "content": f"Queries:\n{numbered}"}
+                ],
+                temperature=0,
+                max_tokens=6 * len(batch)
+            )
+            content = response.choices[0].message.content or ""
+            answers = {int(n): verdict.upper() == "YES" for n, verdict in _BATCH_DECISION_RE.findall(content)}
+        except Exception as e:
+            logger.error(f"Error in needs_web_search_batch: {e}")
+        
+        # Missing or unparsable answers default to YES, like needs_web_search errors
+        for n, i in enumerate(batch, 1):
+            decisions[i] = answers.get(n, True)
+    
+    return decisions
+
 def _extract_urls_from_metadata(message) -> List[str]:
     """Extract URLs from message metadata if available."""
     try:
-        if hasattr(message, 'metadata') and message.metadata:
-            urls = []
-            for item in message.metadata.get('citations', []):
-                if 'url' in item:
-                    urls.append(item['url'])
-            return urls
-    except Exception:
-        pass
-    return []
-
-def _extract_urls_from_text(text: str) -> List[str]:
-    """Extract URLs from text using regex."""
-    url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-    return re.findall(url_pattern, text)
+        citations = (getattr(message, 'metadata', None) or {}).get('citations', ())
+        return [item['url'] for item in citations if 'url' in item]
+    except AttributeError:
+        # metadata present but not dict-like
+        return []
+
+# Above this many URLs, _clean_urls uses pyarrow's vectorized string kernels
+_ARROW_CLEAN_MIN_URLS = 32
+
+# RE2 (used by pyarrow) has no lookaheads, so a word boundary ends the parameter name;
+# a leading '?' is kept via the capture group so the next parameter stays well formed
+_ARROW_TRACKING_PARAM = r'(?:utm_[a-z]+|fbclid|gclid)\b(?:=[^&#]*)?'
+_ARROW_TRACKING_RE = rf'(\?){_ARROW_TRACKING_PARAM}|&{_ARROW_TRACKING_PARAM}'
+
+def _clean_urls_arrow(urls: List[str]) -> List[str]:
+    """Vectorized _clean_urls for large URL lists (one kernel call per step)."""
+    arr = pa.array(urls, type=pa.string())
+    arr = pc.replace_substring_regex(arr, r'[.,;!?)]+$', '')
+    arr = pc.replace_substring_regex(arr, _ARROW_TRACKING_RE, r'\1')
+    arr = pc.replace_substring(arr, '?&', '?')
+    arr = pc.replace_substring(arr, '?#', '#')
+    arr = pc.utf8_rtrim(arr, characters='?')
+    arr = arr.filter(pc.starts_with(arr, 'http'))
+    return arr.unique().to_pylist()  # unique keeps first-seen order
+
+def _strip_url_noise(match: re.Match) -> str:
+    """Drop a tracking parameter, keeping its '?' so the next parameter still has one."""
+    return '?' if match.group(0).startswith('?') and match.group(1) else ''
+
 
 def _clean_urls(urls: List[str]) -> List[str]:
     """Clean and deduplicate URLs."""
     if not urls:
         return []
+    if pa is not None and len(urls) > _ARROW_CLEAN_MIN_URLS:
+        return _clean_urls_arrow(urls)
+    
+    # One regex pass removes tracking parameters and trailing punctuation, then
+    # dict.fromkeys dedupes while keeping first-seen order
+    cleaned = (
+        _CLEAN_URL_RE.sub(_strip_url_noise, url).replace('?&', '?').replace('?#', '#').rstrip('?')
+        for url in urls
+    )
+    return list(dict.fromkeys(url for url in cleaned if url.startswith('http')))
+
+def _search_request(query: str) -> Dict[str, Any]:
+    """Build the streaming chat.completions arguments for an OpenAI web search."""
+    return {
+        "model": "gpt-4o-search-preview",
+        "web_search_options": {"search_context_size": "high"},
+        "messages": [{"role": "user", "content": query}],
+        "stream": True,
+    }
+
+class _StreamedAnswer:
+    """
+    Accumulates a streamed search answer and extracts URLs as it arrives,
+    so only the unscanned tail is left for the regex once the stream ends.
+    """
     
-    cleaned = []
-    seen = set()
+    SCAN_EVERY = 1024  # characters of new text between incremental URL scans
     
-    for url in urls:
-        # Remove trailing punctuation and clean up
-        url = url.rstrip('.,;!?)')
-        
-        # Remove common tracking parameters
-        tracking_params = ['utm_source=openai', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'fbclid', 'gclid']
-        for param in tracking_params:
-            if f'?{param}' in url:
-                url = url.replace(f'?{param}', '')
-            elif f'&{param}' in url:
-                url = url.replace(f'&{param}', '')
+    def __init__(self):
+        self.parts = []
+        self.length = 0
+        self.text = ""
+        self.scan_pos = 0
+        self.scanned_len = 0
+        self.metadata_urls = []
+        self.text_urls = []
+    
+    def feed(self, delta) -> None:
+        """Add one streamed delta (content plus any citation metadata)."""
+        self.metadata_urls.extend(_extract_urls_from_metadata(delta))
+        if delta.content:
+            self.parts.append(delta.content)
+            self.length += len(delta.content)
+            if self.length - self.scanned_len >= self.SCAN_EVERY:
+                self._scan(final=False)
+    
+    def _scan(self, final: bool) -> None:
+        """Collect URLs between scan_pos and the end of the text received so far."""
+        self.text = "".join(self.parts)
+        self.parts = [self.text]
+        self.scanned_len = len(self.text)
         
-        # Clean up any remaining double separators
-        url = url.replace('?&', '?').replace('&&', '&')
-        if url.endswith('?'):
-            url = url[:-1]
+        for match in _URL_RE.finditer(self.text, self.scan_pos):
+            if not final and match.end() == len(self.text):
+                # The URL may continue in the next chunk; rescan it next time
+                self.scan_pos = match.start()
+                return
+            self.text_urls.append(match.group(0))
+            self.scan_pos = match.end()
         
-        # Ensure URL is valid and not seen before
-        if url and url.startswith('http') and url not in seen:
-            cleaned.append(url)
-            seen.add(url)
+        # A partial "https://" at the very end cannot have matched yet
+        if not final:
+            self.scan_pos = max(self.scan_pos, len(self.text) - len("https://"))
     
-    return cleaned
+    def result(self, query: str) -> Dict[str, Any]:
+        """Finish the URL scan and extract the journal from the complete answer."""
+        self._scan(final=True)
+        answer = self.text
+        urls = _clean_urls(self.metadata_urls or self.text_urls)
+        
+        # Extract journal name from answer
+        journal = ""
+        for pattern in _JOURNAL_RES:
+            match = pattern.search(answer)
+            if match:
+                journal = match.group(1).strip()
+                break
+        
+        return {
+            "query": query,
+            "answer": answer,
+            "journal": journal,
+            "urls": urls
+        }
+
+# Recent search results keyed by normalized query (errors are never cached).
+# TTLCache is not thread-safe and searches run on worker threads, hence the lock.
+_SEARCH_CACHE = TTLCache(maxsize=512, ttl=300)
+_SEARCH_CACHE_LOCK = threading.Lock()
+
+def _search_cache_key(query: str) -> str:
+    """Normalize a query so trivially different spellings share a cache entry."""
+    return query.strip().lower()
+
+def _cached_search(query: str) -> Optional[Dict[str, Any]]:
+    """Return a cached search result for the query, if still fresh."""
+    with _SEARCH_CACHE_LOCK:
+        return _SEARCH_CACHE.get(_search_cache_key(query))
+
+def _cache_search(query: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Store a successful search result and return it."""
+    with _SEARCH_CACHE_LOCK:
+        _SEARCH_CACHE[_search_cache_key(query)] = result
+    return result
 
 def openai_search_tool(
     query: Annotated[str, "The search query to send to OpenAI."],
@@ -125,40 +414,42 @@ def openai_search_tool(
           "urls":   List[str]   # unique, cleaned
         }
     """
+    cached = _cached_search(query)
+    if cached is not None:
+        return cached
+    
     try:
-        client = openai.OpenAI()
+        client = _client()
+        answer = _StreamedAnswer()
+        with client.chat.completions.create(**_search_request(query)) as stream:
+            for chunk in stream:
+                if chunk.choices:
+                    answer.feed(chunk.choices[0].delta)
+        return _cache_search(query, answer.result(query))
 
-        completion = client.chat.completions.create(
-            model="gpt-4o-search-preview",
-            web_search_options={"search_context_size": "high"},
-            messages=[{"role": "user", "content": query}],
-        )
+    except Exception as exc:
+        error = f"OpenAI search failed: {exc!r}"
+        logger.error(error)
+        return {"error": error}
 
-        msg = completion.choices[0].message
-        answer = msg.content
-        urls = _extract_urls_from_metadata(msg) or _extract_urls_from_text(answer)
-        urls = _clean_urls(urls)
+async def _stream_search_async(query: str) -> _StreamedAnswer:
+    """Stream the search answer with the shared async client (run on the search loop)."""
+    answer = _StreamedAnswer()
+    async with await _async_client().chat.completions.create(**_search_request(query)) as stream:
+        async for chunk in stream:
+            if chunk.choices:
+                answer.feed(chunk.choices[0].delta)
+    return answer
 
-        # Extract journal name from answer
-        journal = ""
-        patterns = [
-            r'Published in: ([^\n]+)',
-            r'Journal: ([^\n]+)',
-            r'Published by ([^\n]+)',
-            r'Source: ([^\n]+)'
-        ]
-        for pat in patterns:
-            match = re.search(pat, answer)
-            if match:
-                journal = match.group(1).strip()
-                break
-
-        return {
-            "query": query,
-            "answer": answer,
-            "journal": journal,
-            "urls": urls
-        }
+async def openai_search_tool_async(query: str) -> Dict[str, Any]:
+    """Async variant of openai_search_tool."""
+    cached = _cached_search(query)
+    if cached is not None:
+        return cached
+    
+    try:
+        answer = await _on_search_loop(_stream_search_async(query))
+        return _cache_search(query, answer.result(query))
 
     except Exception as exc:
         error = f"OpenAI search failed: {exc!r}"
@@ -176,6 +467,41 @@ def web_search(query: str) -> Dict[str, Any]:
     """
     return openai_search_tool(query)
 
+async def web_search_async(query: str, on_search: Optional[Callable[[], None]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Classify the query and speculatively run the web search at the same time.
+    
+    The search is cancelled if the classifier answers NO, so queries that need
+    search wait roughly max(classifier, search) instead of classifier + search.
+    
+    Args:
+        query (str): The search query string
+        on_search (Callable): Called once the classifier decides search is needed
+    Returns:
+        Search results dict, or None if the query does not need web search
+    """
+    # A confident local decision needs no network call, so don't speculate
+    local_decision = _classify_locally(query)
+    if local_decision is False:
+        return None
+    if local_decision:
+        if on_search:
+            on_search()
+        return await openai_search_tool_async(query)
+    
+    t_cls = asyncio.create_task(needs_web_search_async(query))
+    t_search = asyncio.create_task(openai_search_tool_async(query))
+    
+    if not await t_cls:
+        t_search.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await t_search
+        return None
+    
+    if on_search:
+        on_search()
+    return await t_search
+
 def format_search_results(search_results: Dict[str, Any]) -> str:
     """
     Format search results for display in the chat with in-text citations.
@@ -192,40 +518,56 @@ def format_search_results(search_results: Dict[str, Any]) -> str:
     urls = search_results.get("urls", [])
     journal = search_results.get("journal", "")
     
+    # Parse domains once for both the citations and the source line
+    cited = _urls_with_domains(urls[:3])  # Limit to first 3 URLs
+    
     # Add in-text citations to the answer
-    answer_with_citations = _add_in_text_citations(answer, urls)
+    answer_with_citations = _add_in_text_citations(answer, cited)
     
     formatted = f"**Search Results:**\n\n{answer_with_citations}\n\n"
     
-    if urls:
-        # Extract domain from the first URL for source display
-        try:
-            first_url = urls[0]
-            if '://' in first_url:
-                domain = first_url.split('://')[1].split('/')[0]
-            else:
-                domain = first_url.split('/')[0]
-            # Clean up domain (remove www, etc.)
-            domain = domain.replace('www.', '')
+    if cited:
+        # Domain of the first URL for source display, falling back to the journal
+        domain = cited[0][1]
+        if domain:
             formatted += f"**Source:** {domain}\n\n"
-        except:
-            # Fallback to journal if URL parsing fails
-            if journal:
-                formatted += f"**Source:** {journal}\n\n"
+        elif journal:
+            formatted += f"**Source:** {journal}\n\n"
     
     return formatted
 
-def _add_in_text_citations(text: str, urls: List[str]) -> str:
+def _urls_with_domains(urls: List[str]) -> List[Tuple[str, str]]:
+    """
+    Pair each URL with its host name, without a leading "www.".
+    
+    Args:
+        urls (List[str]): URLs to parse
+    Returns:
+        List[Tuple[str, str]]: (url, domain) pairs; domain is "" if the URL has no host
+    """
+    pairs = []
+    for url in urls:
+        try:
+            host = urlsplit(url).hostname or ""
+        except ValueError:  # e.g. malformed IPv6 netloc
+            host = ""
+        pairs.append((url, host.removeprefix('www.')))
+    return pairs
+
+# Subdomains dropped from citation labels ("www." is already stripped by _urls_with_domains)
+_CITATION_SUBDOMAINS = ('m.', 'mobile.', 'en.', 'api.', 'blog.', 'news.', 'support.')
+
+def _add_in_text_citations(text: str, cited: List[Tuple[str, str]]) -> str:
     """
     Add domain-based citations to the text content based on URLs.
     
     Args:
         text (str): The original text content
-        urls (List[str]): List of URLs to cite
+        cited (List[Tuple[str, str]]): (url, domain) pairs to cite, from _urls_with_domains
     Returns:
         str: Text with in-text citations added using domain names
     """
-    if not urls or not text:
+    if not cited or not text:
         return text
     
     # Check if the text already contains proper citations
@@ -235,31 +577,17 @@ def _add_in_text_citations(text: str, urls: List[str]) -> str:
     
     # If no citations found, add them at the end
     citation_text = "\n\n**Sources:**\n"
-    for i, url in enumerate(urls[:3], 1):  # Limit to first 3 URLs
-        try:
-            # Extract domain from URL
-            if '://' in url:
-                domain = url.split('://')[1].split('/')[0]
-            else:
-                domain = url.split('/')[0]
-            
-            # Clean up domain (remove www, subdomains, etc.)
-            domain = domain.replace('www.', '')
-            
-            # Handle common subdomains that should be removed
-            subdomains_to_remove = ['m.', 'mobile.', 'en.', 'www.', 'api.', 'blog.', 'news.', 'support.']
-            for subdomain in subdomains_to_remove:
-                if domain.startswith(subdomain):
-                    domain = domain[len(subdomain):]
-                    break
-            
-            # Ensure domain is not empty and has proper format
-            if domain and '.' in domain:
-                citation_text += f"{i}. [{domain}]({url})\n"
-            else:
-                citation_text += f"{i}. {url}\n"
-        except Exception as e:
-            logger.warning(f"Error processing URL {url}: {e}")
+    for i, (url, domain) in enumerate(cited, 1):
+        # Handle common subdomains that should be removed
+        for subdomain in _CITATION_SUBDOMAINS:
+            if domain.startswith(subdomain):
+                domain = domain[len(subdomain):]
+                break
+        
+        # Ensure domain is not empty and has proper format
+        if domain and '.' in domain:
+            citation_text += f"{i}. [{domain}]({url})\n"
+        else:
             citation_text += f"{i}. {url}\n"
     
     return text + citation_text
\ No newline at end of file